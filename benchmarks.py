@@ -0,0 +1,200 @@
+"""Timing and peak-memory benchmarks for the simulation hot paths.
+
+Each benchmark builds its inputs for one size outside the timed region and
+returns the callable to time. Wall time is the best and median per call over
+repeated perf_counter runs (timeit), and peak memory is the tracemalloc peak
+of one additional call (memory-mapped files are not counted). Results are
+written as JSON and can be compared against a saved baseline:
+
+    python benchmarks.py --quick --output bench.json
+    python benchmarks.py --save-baseline benchmarks_baseline.json
+    python benchmarks.py --baseline benchmarks_baseline.json   # exit 1 on regression
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+import scipy
+
+# name -> (setup(size) -> callable, full sizes, quick sizes)
+BENCHMARKS = {}
+
+
+def register_benchmark(name, sizes, quick_sizes=None):
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, list(sizes), list(quick_sizes or sizes[:2]))
+        return setup
+    return decorator
+
+
+# =========================
+# Benchmarks
+# =========================
+
+@register_benchmark("single_cell_odeint", [100, 1000, 10_000])
+def _single_cell_odeint(n_points):
+    from bioelectric_solver import bioelectric_model, solve
+    t = np.linspace(0, 50, n_points)
+    return lambda: solve(bioelectric_model, [1, 1], t, args=(1, 0.1, 0.01), method="odeint")
+
+
+@register_benchmark("single_cell_closed_form", [100, 1000, 10_000])
+def _single_cell_closed_form(n_points):
+    from bioelectric_solver import bioelectric_model, solve
+    t = np.linspace(0, 50, n_points)
+    return lambda: solve(bioelectric_model, [1, 1], t, args=(1, 0.1, 0.01))
+
+
+@register_benchmark("dose_response_sweep", [10, 1000, 100_000], [10, 1000])
+def _dose_response_sweep(n_points):
+    from dose_response import dose_response
+    conc = np.logspace(-7, -3, n_points)
+    return lambda: dose_response("amiloride", conc)
+
+
+@register_benchmark("coupled_tissue", [10, 100, 1000], [10, 100])
+def _coupled_tissue(n):
+    """figure4_tissue.py setup on an n x n grid: 500 Euler steps, left half amiloride."""
+    from gap_junction_tissue import simulate_coupled_tissue
+    from tissue_sim import half_mask
+    shape = (n, n)
+    t = np.linspace(0, 50, 500)
+    k3 = np.where(half_mask(*shape), 0.001, 0.01)
+    return lambda: simulate_coupled_tissue(1, 0.1, k3, shape, t, coupling=0.1)
+
+
+@register_benchmark("coupled_tissue_float32", [10, 100, 1000], [10, 100])
+def _coupled_tissue_float32(n):
+    """coupled_tissue in float32, reusing one TissueBuffers across calls."""
+    from gap_junction_tissue import TissueBuffers, simulate_coupled_tissue
+    from tissue_sim import half_mask
+    shape = (n, n)
+    t = np.linspace(0, 50, 500)
+    k3 = np.where(half_mask(*shape), 0.001, 0.01)
+    buffers = TissueBuffers(n * n, np.float32)
+    return lambda: simulate_coupled_tissue(1, 0.1, k3, shape, t, coupling=0.1, buffers=buffers)
+
+
+def _stage3_problem():
+    from population_eval import ivermectin_k3_scale
+    from tissue_sim import simulate_tissue
+    t = np.linspace(0, 100, 2000)
+    k3_scale = ivermectin_k3_scale(10, factor=2.0)
+    target = simulate_tissue([1.0, 1.0, 1.0], np.ones((10, 10)), t, (1, 1))
+    return target, k3_scale, t
+
+
+@register_benchmark("stage3_evaluate", [1, 100], [1])
+def _stage3_evaluate(n_individuals):
+    """n_individuals calls of stage3_evaluate, the body of ivermectin_stage3_evolution.evaluate."""
+    from parallel_evolution import stage3_evaluate
+    target, k3_scale, t = _stage3_problem()
+    genomes = np.random.default_rng(0).uniform(0.5, 2.0, (n_individuals, 3))
+    return lambda: [stage3_evaluate(g, target, k3_scale, t, (1, 1)) for g in genomes]
+
+
+@register_benchmark("ga_generation", [20, 100, 1000], [20, 100])
+def _ga_generation(pop_size):
+    """One eaSimple generation of the stage-3 GA, including the initial population evaluation."""
+    from deap import algorithms
+    from parallel_evolution import make_stage3_toolbox
+    target, k3_scale, t = _stage3_problem()
+    toolbox = make_stage3_toolbox(target, k3_scale, t, (1, 1))
+
+    def generation():
+        random.seed(0)
+        pop = toolbox.population(n=pop_size)
+        return algorithms.eaSimple(pop, toolbox, cxpb=0.5, mutpb=0.2, ngen=1, verbose=False)
+    return generation
+
+
+# =========================
+# Measurement
+# =========================
+
+def measure(func, min_time=0.5, max_repeat=5):
+    """(best seconds, median seconds, loops per repeat, peak tracemalloc MB) per func() call.
+
+    Fast calls are looped (timeit.autorange, >= 0.2 s per repeat); repeats
+    continue until min_time has elapsed or max_repeat is reached.
+    """
+    timer = timeit.Timer(func)
+    number, taken = timer.autorange()
+    repeats = min(max_repeat, max(1, math.ceil(min_time / taken)))
+    times = [taken / number] + [r / number for r in timer.repeat(repeats - 1, number)]
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), statistics.median(times), number, peak / 1e6
+
+
+def run_benchmarks(names=None, quick=False, min_time=0.5, max_repeat=5, verbose=True):
+    """Run the selected benchmarks over their size matrix; returns the JSON-ready report."""
+    results = []
+    for name in names or BENCHMARKS:
+        setup, sizes, quick_sizes = BENCHMARKS[name]
+        for size in quick_sizes if quick else sizes:
+            best, median, loops, peak = measure(setup(size), min_time, max_repeat)
+            results.append({"name": name, "size": size, "best_s": best, "median_s": median,
+                            "loops": loops, "peak_mb": peak})
+            if verbose:
+                print(f"{name:26s} {size:>8} {best * 1e3:12.3f} ms {peak:10.2f} MB")
+    return {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__,
+                 "scipy": scipy.__version__, "machine": platform.machine(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25):
+    """Entries whose best time exceeds the baseline's by more than tolerance (fractional)."""
+    reference = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        old = reference.get((r["name"], r["size"]))
+        if old is not None and r["best_s"] > old["best_s"] * (1 + tolerance):
+            regressions.append({"name": r["name"], "size": r["size"], "best_s": r["best_s"],
+                                "baseline_s": old["best_s"], "ratio": r["best_s"] / old["best_s"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="compare against this report; exit 1 on regression")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also write the report here")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed fractional slowdown versus the baseline")
+    parser.add_argument("--min-time", type=float, default=0.5)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.only, args.quick, args.min_time)
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['name']} size {r['size']}: {r['best_s'] * 1e3:.3f} ms "
+                  f"vs {r['baseline_s'] * 1e3:.3f} ms (x{r['ratio']:.2f})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
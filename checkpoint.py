@@ -0,0 +1,168 @@
+"""Resumable GA runs with compact, array-backed checkpoints.
+
+A checkpoint is one .npz file, written atomically (temporary file, then
+os.replace). It holds:
+
+    generation              last completed generation
+    genomes, fitness        population, (n, n_genes) and (n, n_obj); NaN = invalid
+    hof_genomes, hof_fitness hall of fame, best first; hof_maxsize
+    logbook_keys, logbook_header, logbook_<key>   one array per logbook column
+    py_random_state, py_gauss_next                random.getstate()
+    np_random_keys, np_random_pos, np_random_gauss numpy's global MT19937 state
+
+Nothing is pickled, so checkpoints load with allow_pickle=False. They are
+independent of the DEAP version, and the fitness values round-trip
+exactly. ea_simple is algorithms.eaSimple with a checkpoint every `every`
+generations. Resuming from a checkpoint restores the RNG states, so the
+rest of the run is bit-identical to an uninterrupted one:
+
+    snapshot = load_checkpoint("stage3.ckpt.npz") if resume else None
+    pop, logbook = ea_simple(pop, toolbox, 0.5, 0.2, 50, stats, hof,
+                             checkpoint="stage3.ckpt.npz", every=5, resume=snapshot)
+"""
+import os
+import random
+
+import numpy as np
+from deap import algorithms, creator, tools
+
+
+def _fitness_matrix(individuals, n_obj):
+    fits = np.full((len(individuals), n_obj), np.nan)
+    for row, ind in zip(fits, individuals):
+        if ind.fitness.valid:
+            row[:] = ind.fitness.values
+    return fits
+
+
+def save_checkpoint(path, generation, population, halloffame=None, logbook=None):
+    """Snapshot a GA run and the random / numpy global RNG states to path (.npz)."""
+    n_obj = len(population[0].fitness.weights)
+    arrays = {
+        "generation": np.int64(generation),
+        "genomes": np.array([list(ind) for ind in population], dtype=float),
+        "fitness": _fitness_matrix(population, n_obj),
+    }
+    if halloffame is not None:
+        arrays["hof_maxsize"] = np.int64(halloffame.maxsize)
+        arrays["hof_genomes"] = np.array([list(ind) for ind in halloffame],
+                                         dtype=float).reshape(len(halloffame), -1)
+        arrays["hof_fitness"] = _fitness_matrix(halloffame, n_obj)
+    if logbook is not None:
+        keys = list(logbook[0]) if len(logbook) else []
+        arrays["logbook_keys"] = np.array(keys, dtype=str)
+        arrays["logbook_header"] = np.array(logbook.header or [], dtype=str)
+        for key in keys:
+            arrays[f"logbook_{key}"] = np.array(logbook.select(key))
+
+    version, state, gauss_next = random.getstate()
+    arrays["py_random_state"] = np.array((version,) + state, dtype=np.uint64)
+    arrays["py_gauss_next"] = np.float64(np.nan if gauss_next is None else gauss_next)
+    _, keys, pos, has_gauss, cached = np.random.get_state()
+    arrays["np_random_keys"] = keys
+    arrays["np_random_pos"] = np.int64(pos)
+    arrays["np_random_gauss"] = np.array([has_gauss, cached], dtype=float)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """Arrays of a checkpoint written by save_checkpoint, as a dict."""
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _individuals(genomes, fitness, individual_type):
+    individuals = []
+    for genome, fit in zip(genomes, fitness):
+        ind = individual_type(genome.tolist())
+        if not np.isnan(fit).any():
+            ind.fitness.values = tuple(fit.tolist())
+        individuals.append(ind)
+    return individuals
+
+
+def restore_checkpoint(snapshot, halloffame=None, individual_type=None):
+    """(generation, population, logbook) from a snapshot; also restores both RNG states.
+
+    The hall of fame, if given, is refilled in place, so closures holding it
+    (e.g. parallel_evolution.hof_cutoff) stay valid.
+    """
+    individual_type = individual_type or creator.Stage3Individual
+    population = _individuals(snapshot["genomes"], snapshot["fitness"], individual_type)
+
+    if halloffame is not None and "hof_genomes" in snapshot:
+        halloffame.clear()
+        halloffame.maxsize = int(snapshot["hof_maxsize"])
+        for ind in _individuals(snapshot["hof_genomes"], snapshot["hof_fitness"],
+                                individual_type):
+            halloffame.items.append(ind)
+            halloffame.keys.insert(0, ind.fitness)
+
+    logbook = tools.Logbook()
+    if "logbook_keys" in snapshot:
+        keys = [str(k) for k in snapshot["logbook_keys"]]
+        columns = [snapshot[f"logbook_{k}"] for k in keys]
+        for row in zip(*columns):
+            logbook.record(**{k: v.item() if np.issubdtype(v.dtype, np.integer) else v
+                              for k, v in zip(keys, row)})
+        logbook.header = [str(h) for h in snapshot["logbook_header"]] or None
+
+    state = snapshot["py_random_state"].tolist()
+    gauss_next = float(snapshot["py_gauss_next"])
+    random.setstate((state[0], tuple(state[1:]), None if np.isnan(gauss_next) else gauss_next))
+    has_gauss, cached = snapshot["np_random_gauss"]
+    np.random.set_state(("MT19937", snapshot["np_random_keys"], int(snapshot["np_random_pos"]),
+                         int(has_gauss), float(cached)))
+    return int(snapshot["generation"]), population, logbook
+
+
+def ea_simple(population, toolbox, cxpb, mutpb, ngen, stats=None, halloffame=None,
+              verbose=__debug__, checkpoint=None, every=10, resume=None):
+    """algorithms.eaSimple with periodic checkpoints; returns (population, logbook).
+
+    With checkpoint set, a snapshot is written after generation 0, every
+    `every` generations and after the last one. resume (a load_checkpoint
+    dict) replaces population and continues after its generation.
+    """
+    if resume is not None:
+        start, population, logbook = restore_checkpoint(resume, halloffame)
+        if verbose:
+            print(logbook.stream)
+    else:
+        logbook = tools.Logbook()
+        logbook.header = ["gen", "nevals"] + (stats.fields if stats else [])
+        invalid = [ind for ind in population if not ind.fitness.valid]
+        for ind, fit in zip(invalid, toolbox.map(toolbox.evaluate, invalid)):
+            ind.fitness.values = fit
+        if halloffame is not None:
+            halloffame.update(population)
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=0, nevals=len(invalid), **record)
+        if verbose:
+            print(logbook.stream)
+        start = 0
+        if checkpoint:
+            save_checkpoint(checkpoint, 0, population, halloffame, logbook)
+
+    for gen in range(start + 1, ngen + 1):
+        offspring = toolbox.select(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+        invalid = [ind for ind in offspring if not ind.fitness.valid]
+        for ind, fit in zip(invalid, toolbox.map(toolbox.evaluate, invalid)):
+            ind.fitness.values = fit
+        if halloffame is not None:
+            halloffame.update(offspring)
+        population[:] = offspring
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=len(invalid), **record)
+        if verbose:
+            print(logbook.stream)
+        if checkpoint and (gen % every == 0 or gen == ngen):
+            save_checkpoint(checkpoint, gen, population, halloffame, logbook)
+    return population, logbook
@@ -0,0 +1,96 @@
+"""Vectorized dose-response sweeps over concentration x IC50 x Hill x baseline k3 grids.
+
+Each drug maps concentration onto k3 (Hill inhibition for channel
+blockers, direct k3 scaling for the ivermectin-like Cl- pathway), and the
+final Vnorm is evaluated in closed form for the whole grid at once.
+"""
+import numpy as np
+from bioelectric_solver import bioelectric_model, batched_final_state
+
+# effect: "inhibit" -> k3 = k3_baseline * (1 - Hill(conc)); "scale" -> k3 = k3_baseline * conc
+DRUGS = {
+    "amiloride": {"effect": "inhibit", "ic50": 1e-5, "hill_n": 1.0},   # M (figure2_sweep.py)
+    "propranolol": {"effect": "inhibit", "ic50": 30.0, "hill_n": 1.5},  # ug/L (figure5_propranolol.py)
+    "ivermectin": {"effect": "scale"},                                  # x baseline Cl conductance
+}
+
+GRID_AXES = ("concentration", "ic50", "hill_n", "k3_baseline")
+
+
+def hill_inhibition(conc, ic50, hill_n):
+    """Fractional inhibition conc^n / (IC50^n + conc^n), written to avoid overflow."""
+    conc = np.asarray(conc, dtype=float)
+    with np.errstate(divide="ignore"):
+        return 1.0 / (1.0 + (np.asarray(ic50, dtype=float) / conc) ** hill_n)
+
+
+def k3_for_dose(drug, conc, ic50=None, hill_n=None, k3_baseline=0.01):
+    """Effective k3 under drug at concentration conc (all arguments broadcast)."""
+    spec = DRUGS[drug]
+    if spec["effect"] == "scale":
+        return k3_baseline * np.asarray(conc, dtype=float)
+    ic50 = spec["ic50"] if ic50 is None else ic50
+    hill_n = spec["hill_n"] if hill_n is None else hill_n
+    return k3_baseline * (1.0 - hill_inhibition(conc, ic50, hill_n))
+
+
+class DoseResponse:
+    """Final-Vnorm grid labeled with its axes (dims) and their coordinates (coords)."""
+
+    def __init__(self, values, dims, coords):
+        self.values = values
+        self.dims = dims
+        self.coords = coords
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.values, dtype=dtype)
+
+    def __repr__(self):
+        axes = ", ".join(f"{d}: {len(self.coords[d])}" for d in self.dims)
+        return f"DoseResponse({axes})"
+
+    def sel(self, **labels):
+        """Select by coordinate value (nearest match) along the named axes."""
+        index = []
+        for dim in self.dims:
+            if dim in labels:
+                index.append(int(np.argmin(np.abs(self.coords[dim] - labels.pop(dim)))))
+            else:
+                index.append(slice(None))
+        if labels:
+            raise KeyError(f"unknown dims {sorted(labels)}; have {self.dims}")
+        dims = tuple(d for d, i in zip(self.dims, index) if isinstance(i, slice))
+        values = self.values[tuple(index)]
+        return DoseResponse(values, dims, {d: self.coords[d] for d in dims}) if dims else values
+
+
+def dose_response(drug, concentrations, ic50=None, hill_n=None, k3_baseline=0.01,
+                  k1=1.0, k2=0.1, t_end=50.0, y0=(1, 1), model=bioelectric_model):
+    """Final Vnorm at t_end over the outer-product grid of the 1-D inputs.
+
+    concentrations, ic50, hill_n and k3_baseline may each be a scalar or a
+    1-D array; every non-scalar input becomes one axis of the result, in the
+    order of GRID_AXES. ic50 / hill_n default to the drug's DRUGS entry.
+    """
+    spec = DRUGS[drug]
+    inputs = {"concentration": concentrations, "k3_baseline": k3_baseline}
+    if spec["effect"] == "inhibit":
+        inputs["ic50"] = spec["ic50"] if ic50 is None else ic50
+        inputs["hill_n"] = spec["hill_n"] if hill_n is None else hill_n
+
+    dims = tuple(d for d in GRID_AXES if d in inputs and np.ndim(inputs[d]) > 0)
+    coords = {d: np.asarray(inputs[d], dtype=float).ravel() for d in dims}
+    grid = {}
+    for name, value in inputs.items():
+        value = np.asarray(value, dtype=float)
+        if name in dims:
+            shape = [1] * len(dims)
+            shape[dims.index(name)] = value.size
+            value = value.reshape(shape)
+        grid[name] = value
+
+    k3 = k3_for_dose(drug, grid["concentration"], grid.get("ic50"), grid.get("hill_n"),
+                     grid["k3_baseline"])
+    states = batched_final_state(model, y0, [0.0, t_end], args=(k1, k2, k3))
+    values = np.broadcast_to(states[..., 1], tuple(len(coords[d]) for d in dims))
+    return DoseResponse(np.ascontiguousarray(values), dims, coords)
@@ -1,10 +1,7 @@
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
-
-def bioelectric_model(y, t, k1, k2, k3):
-    X, V = y
-    return [k1 * V - k2 * X * V, -k3 * V]
+from bioelectric_solver import bioelectric_model, solve
+from dose_response import dose_response, k3_for_dose
+from plotting import pyplot, save_figure
 
 # Parameters
 k3_baseline = 0.01
@@ -13,8 +10,7 @@ hill_n = 1.0
 
 def k3_effective(conc):
     # conc in M
-    inhibition = (conc**hill_n) / (IC50**hill_n + conc**hill_n)
-    return k3_baseline * (1.0 - inhibition)
+    return k3_for_dose("amiloride", conc, IC50, hill_n, k3_baseline)
 
 t = np.linspace(0, 50, 1000)
 y0 = [1, 1]
@@ -22,38 +18,50 @@ y0 = [1, 1]
 # Amiloride concentrations (M)
 concs = np.logspace(-8, -3, 6)   # 1e-8 to 1e-3 M
 
-plt.figure(figsize=(12, 5))
-
-final_voltages = []
-
-# Panel A: time courses for a few representative doses
-plt.subplot(1, 2, 1)
-for conc in [1e-8, 1e-6, 1e-4]:
-    k3_eff = k3_effective(conc)
-    sol = odeint(bioelectric_model, y0, t, args=(1, 0.1, k3_eff))
-    plt.plot(t, sol[:, 1], label=f'[Amiloride] = {conc:.0e} M')
-
-plt.xlabel('Time (s)')
-plt.ylabel('Normalized membrane potential')
-plt.title('Single-cell voltage over time\nfor selected amiloride concentrations')
-plt.legend()
-plt.grid(True)
-
-# Panel B: steady-state voltage vs concentration
-for conc in concs:
-    k3_eff = k3_effective(conc)
-    sol = odeint(bioelectric_model, y0, t, args=(1, 0.1, k3_eff))
-    final_voltages.append(sol[-1, 1])
-
-plt.subplot(1, 2, 2)
-plt.semilogx(concs, final_voltages, 'o-')
-plt.xlabel('Amiloride concentration (M, log scale)')
-plt.ylabel('Steady-state normalized membrane potential')
-plt.title('Dose–response of steady-state voltage to amiloride')
-plt.grid(True)
-
-plt.tight_layout()
-plt.savefig('figure2_dose_response.png', dpi=300)
-plt.show()
-
-print("Figure 2 saved with realistic pharmacology axis.")
+
+def time_courses(doses):
+    """Vnorm(t) for each representative dose."""
+    return [solve(bioelectric_model, y0, t, args=(1, 0.1, k3_effective(conc)))[:, 1]
+            for conc in doses]
+
+
+def steady_state_sweep(concentrations):
+    """Final Vnorm vs concentration (whole sweep in one call)."""
+    return dose_response("amiloride", concentrations, ic50=IC50, hill_n=hill_n,
+                         k3_baseline=k3_baseline, k1=1, k2=0.1, t_end=t[-1], y0=y0).values
+
+
+def main():
+    plt = pyplot()
+    plt.figure(figsize=(12, 5))
+
+    # Panel A: time courses for a few representative doses
+    plt.subplot(1, 2, 1)
+    doses = [1e-8, 1e-6, 1e-4]
+    for conc, V_t in zip(doses, time_courses(doses)):
+        plt.plot(t, V_t, label=f'[Amiloride] = {conc:.0e} M')
+
+    plt.xlabel('Time (s)')
+    plt.ylabel('Normalized membrane potential')
+    plt.title('Single-cell voltage over time\nfor selected amiloride concentrations')
+    plt.legend()
+    plt.grid(True)
+
+    # Panel B: steady-state voltage vs concentration
+    final_voltages = steady_state_sweep(concs)
+
+    plt.subplot(1, 2, 2)
+    plt.semilogx(concs, final_voltages, 'o-')
+    plt.xlabel('Amiloride concentration (M, log scale)')
+    plt.ylabel('Steady-state normalized membrane potential')
+    plt.title('Dose–response of steady-state voltage to amiloride')
+    plt.grid(True)
+
+    plt.tight_layout()
+    save_figure('figure2_dose_response.png')
+
+    print("Figure 2 saved with realistic pharmacology axis.")
+
+
+if __name__ == "__main__":
+    main()
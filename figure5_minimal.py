@@ -1,19 +1,54 @@
+import argparse
+
 import numpy as np
-import matplotlib.pyplot as plt
-
-N=50
-healthy = np.ones(N)
-propranolol = np.ones(N); propranolol[:25] = 0.7
-
-for _ in range(200):
-    healthy += np.random.normal(0,0.01,N)
-    diffusion = 0.05 * np.diff(propranolol, prepend=propranolol[0], append=propranolol[-1])
-    propranolol[:25] *= 0.995
-    propranolol += diffusion * 0.8
-
-plt.figure(figsize=(12,4))
-plt.subplot(121); plt.plot(healthy,'g-',lw=2); plt.title('Healthy Tissue')
-plt.subplot(122); plt.plot(propranolol,'b-',lw=2); plt.title('Propranolol Effect')
-plt.suptitle(f'Propranolol: {100*(1-np.mean(propranolol)/np.mean(healthy)):.1f}% disruption')
-plt.savefig('figure5_propranolol.png',dpi=300); plt.show()
-print('Figure 5 COMPLETE!')
+from plotting import pyplot, save_figure
+from stochastic_ensemble import (N, NOISE_SD, STEPS, disruption, initial_profiles, minimal_step,
+                                 run_ensemble)
+
+
+def simulate_minimal(rng=None):
+    """1-D healthy (noisy) and propranolol (left half decaying) tissue profiles."""
+    rng = np.random.default_rng() if rng is None else rng
+    healthy, propranolol = initial_profiles()
+    for _ in range(STEPS):
+        minimal_step(healthy, propranolol, rng.normal(0, NOISE_SD, N))
+    return healthy, propranolol
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Figure 5 minimal noisy tissue model")
+    parser.add_argument("--realizations", type=int, default=1000,
+                        help="ensemble size (1: a single realization, as originally plotted)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    plt = pyplot()
+    plt.figure(figsize=(12,4))
+    if args.realizations == 1:
+        healthy, propranolol = simulate_minimal(np.random.default_rng(args.seed))
+        plt.subplot(121); plt.plot(healthy,'g-',lw=2); plt.title('Healthy Tissue')
+        plt.subplot(122); plt.plot(propranolol,'b-',lw=2); plt.title('Propranolol Effect')
+        title = f'Propranolol: {disruption(healthy, propranolol):.1f}% disruption'
+    else:
+        result = run_ensemble(args.realizations, seed=args.seed, workers=args.workers)
+        cells = np.arange(N)
+        for panel, (name, color, label) in enumerate([("healthy", 'g', 'Healthy Tissue'),
+                                                      ("propranolol", 'b', 'Propranolol Effect')]):
+            stats = result[name]
+            low, high = stats.quantile([0.05, 0.95])
+            plt.subplot(1, 2, panel + 1)
+            plt.fill_between(cells, low, high, color=color, alpha=0.2, label='5-95%')
+            plt.plot(cells, stats.mean, color + '-', lw=2, label='mean')
+            plt.title(label); plt.legend()
+        d = result["disruption"]
+        low, high = d.quantile([0.025, 0.975])
+        title = (f'Propranolol: {d.mean:.1f}% disruption '
+                 f'(95% range {low:.1f}-{high:.1f}, n={d.count})')
+    plt.suptitle(title)
+    save_figure('figure5_propranolol.png')
+    print('Figure 5 COMPLETE!')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,43 @@
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
+from plotting import pyplot, save_figure
+from pk_tissue import plasma_concentration, emax_blockade
 
-def propranolol_pk(C, t, ke=0.231):
-    # One-compartment first-order elimination
-    return -ke * C
-
-# Dose and PK parameters (illustrative)
+# Dose and PK parameters (illustrative); one-compartment first-order
+# elimination, solved in closed form by pk_tissue.plasma_concentration
 D = 80e3          # dose in micrograms
 F = 0.26          # bioavailability (fraction)
 Vd = 5.11 * 70    # volume of distribution (L * kg), approximated
-
-# Initial concentration
-C0 = F * D / Vd
+ke = 0.231        # elimination rate (1/h)
 
 # Time in hours
 t = np.linspace(0, 24, 100)
 
-# Plasma concentration over time
-C = odeint(propranolol_pk, C0, t)[:, 0]
-
 # Simple Emax/Hill model for channel/receptor blockade
 IC50 = 30.0       # concentration units consistent with C
 n = 1.5
-E = C**n / (IC50**n + C**n)   # fractional effect (0–1)
-
-plt.figure(figsize=(6, 4))
-plt.plot(t, E * 100)
-plt.xlabel('Time (hours)')
-plt.ylabel('Propranolol blockade (%)')
-plt.title('Time course of propranolol-like blockade')
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('figure5.png', dpi=300)
-plt.show()
+
+
+def blockade_time_course():
+    """Plasma concentration and fractional blockade on t for the single dose."""
+    # Plasma concentration over time: F*D/Vd * exp(-ke * t) for the single dose at t=0
+    C = plasma_concentration(t, [0.0], [D], F=F, Vd=Vd, ke=ke)
+    E = emax_blockade(C, IC50, n)   # fractional effect (0–1)
+    return C, E
+
+
+def main():
+    plt = pyplot()
+    C, E = blockade_time_course()
+
+    plt.figure(figsize=(6, 4))
+    plt.plot(t, E * 100)
+    plt.xlabel('Time (hours)')
+    plt.ylabel('Propranolol blockade (%)')
+    plt.title('Time course of propranolol-like blockade')
+    plt.grid(True)
+    plt.tight_layout()
+    save_figure('figure5.png')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Fitness memoization for GA individuals.
+
+Fitness values are cached under a quantized genome plus a hash of the
+experiment configuration (target pattern, drug mask, time grid, ...), with
+bounded LRU eviction, hit/miss counters and optional .npz persistence so a
+resumed run reuses earlier evaluations.
+"""
+import hashlib
+import numbers
+import os
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+
+def _update_canonical(h, value):
+    """Feed a process-independent serialisation of value into hash h.
+
+    Arrays and numeric sequences hash by dtype, shape and bytes; callables by
+    module and qualified name (partials also by their bound arguments);
+    dicts by sorted items. Nothing depends on object ids or repr() of objects.
+    """
+    if value is None:
+        h.update(b"None")
+    elif isinstance(value, (str, bytes)):
+        h.update(repr(value).encode())
+    elif isinstance(value, partial):
+        h.update(b"partial")
+        _update_canonical(h, value.func)
+        _update_canonical(h, value.args)
+        _update_canonical(h, value.keywords)
+    elif callable(value):
+        h.update(f"{value.__module__}.{value.__qualname__}".encode())
+    elif isinstance(value, dict):
+        h.update(f"dict{len(value)}".encode())
+        for key in sorted(value):
+            h.update(str(key).encode())
+            _update_canonical(h, value[key])
+    elif isinstance(value, (list, tuple)) and not all(isinstance(v, numbers.Number)
+                                                       for v in value):
+        h.update(f"seq{len(value)}".encode())
+        for item in value:
+            _update_canonical(h, item)
+    elif isinstance(value, (np.ndarray, np.generic, numbers.Number, list, tuple)):
+        arr = np.ascontiguousarray(np.asarray(value))
+        if arr.dtype == object:
+            raise TypeError("config_hash cannot hash object arrays")
+        h.update(str((arr.dtype.str, arr.shape)).encode())
+        h.update(arr.tobytes())
+    else:
+        raise TypeError(f"config_hash cannot hash {type(value).__name__} values")
+
+
+def config_hash(**parts):
+    """Stable hash of an experiment configuration, identical across processes."""
+    h = hashlib.sha1()
+    for name in sorted(parts):
+        h.update(name.encode())
+        _update_canonical(h, parts[name])
+    return h.hexdigest()[:16]
+
+
+class FitnessCache:
+    """LRU cache of fitness tuples keyed on (config hash, quantized genome).
+
+    Genes are rounded to `decimals` places, so genomes closer than that share
+    an entry. With a path, existing entries are loaded on creation and save()
+    writes them back atomically.
+    """
+
+    def __init__(self, maxsize=100_000, decimals=9, config=None, path=None):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.config = config_hash(**(config or {}))
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def key(self, genome):
+        scaled = np.rint(np.asarray(genome, dtype=float) * 10.0 ** self.decimals)
+        return (self.config,) + tuple(scaled.astype(np.int64).tolist())
+
+    def get(self, genome):
+        """Cached fitness tuple for genome, or None (counts a hit or a miss)."""
+        key = self.key(genome)
+        fit = self._entries.get(key)
+        if fit is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return fit
+
+    def put(self, genome, fitness):
+        key = self.key(genome)
+        self._entries[key] = tuple(float(f) for f in fitness)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self),
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def wrap(self, evaluate):
+        """Cached version of a single-individual evaluate function."""
+        def cached_evaluate(individual):
+            fit = self.get(individual)
+            if fit is None:
+                fit = evaluate(individual)
+                self.put(individual, fit)
+            return fit
+        return cached_evaluate
+
+    def wrap_map(self, map_func, evaluate):
+        """Cached toolbox.map: only cache misses of evaluate reach map_func.
+
+        Fitnesses flagged as bounds (early-abort evaluation) are passed
+        through without being stored.
+        """
+        def cached_map(func, *iterables):
+            if func is not evaluate or len(iterables) != 1:
+                return map_func(func, *iterables)
+            individuals = list(iterables[0])
+            fits = [self.get(ind) for ind in individuals]
+            missing = [i for i, fit in enumerate(fits) if fit is None]
+            if missing:
+                # duplicates inside one batch are evaluated once
+                first = {}
+                for i in missing:
+                    first.setdefault(self.key(individuals[i]), i)
+                todo = list(first.values())
+                computed = {}
+                for i, fit in zip(todo, map_func(func, [individuals[i] for i in todo])):
+                    if not getattr(fit, "bounded", False):
+                        self.put(individuals[i], fit)
+                        fit = tuple(fit)
+                    computed[self.key(individuals[i])] = fit
+                for i in missing:
+                    fits[i] = computed[self.key(individuals[i])]
+            return fits
+        return cached_map
+
+    # =========================
+    # Persistence
+    # =========================
+
+    def save(self, path=None):
+        """Write all entries to an .npz file (atomic replace)."""
+        path = path or self.path
+        if path is None:
+            raise ValueError("no path given for FitnessCache.save")
+        keys = list(self._entries)
+        configs = np.array([k[0] for k in keys], dtype="U16")
+        genomes = np.array([k[1:] for k in keys], dtype=np.int64).reshape(len(keys), -1)
+        fits = np.array([self._entries[k] for k in keys], dtype=float).reshape(len(keys), -1)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, configs=configs, genomes=genomes, fitness=fits,
+                 decimals=self.decimals)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Merge entries from an .npz file written by save()."""
+        with np.load(path) as data:
+            if int(data["decimals"]) != self.decimals:
+                raise ValueError(f"{path} was saved with decimals={int(data['decimals'])}, "
+                                 f"cache uses {self.decimals}")
+            for cfg, genome, fit in zip(data["configs"], data["genomes"], data["fitness"]):
+                key = (str(cfg),) + tuple(genome.tolist())
+                self._entries[key] = tuple(fit.tolist())
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def register_cached_map(toolbox, cache):
+    """Route toolbox.map(toolbox.evaluate, ...) through cache (wraps the current map)."""
+    toolbox.register("map", cache.wrap_map(toolbox.map, toolbox.evaluate))
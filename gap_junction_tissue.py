@@ -0,0 +1,309 @@
+"""Gap-junction coupled N x M tissue engine.
+
+Every cell runs bioelectric_model with its own (k1, k2, k3); voltages are
+coupled through a sparse graph Laplacian over 4- or 8-neighbour grids:
+
+    dX/dt = k1*V - k2*X*V
+    dV/dt = -k3*V + coupling * (mean of V over the closed neighbourhood - V)
+
+which is the per-cell rule of figure4_tissue.py applied on a real 2D grid.
+The whole grid is advanced with whole-array explicit Euler steps, or with
+solve_ivp (BDF) using the analytic sparse Jacobian.
+
+Euler runs can keep their state in float32 (dtype=np.float32). X, V, k1, k2
+and the step scratch then live in one preallocated TissueBuffers block, and
+A is stored by diagonals (DIA) in float32. The state takes half the memory
+and A, having no index arrays, about a third, and each stencil update moves
+correspondingly less data. The same buffers can be passed to repeated
+runs on one grid size, so nothing per-cell is reallocated between them;
+see precision.py for the accuracy checks against float64.
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.integrate import solve_ivp
+
+NEIGHBOR_OFFSETS = {
+    4: [(-1, 0), (1, 0), (0, -1), (0, 1)],
+    8: [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)],
+}
+BOUNDARIES = ("neumann", "periodic", "dirichlet")
+
+
+def coupling_operator(shape, neighbors=4, boundary="neumann"):
+    """Sparse L (cells x cells) with (L @ V) = closed-neighbourhood mean of V - V.
+
+    boundary: "neumann" averages over the neighbours that exist (no flux),
+    "periodic" wraps around the grid edges, "dirichlet" holds cells outside
+    the grid at V = 0.
+    """
+    if neighbors not in NEIGHBOR_OFFSETS:
+        raise ValueError(f"neighbors must be 4 or 8, got {neighbors}")
+    if boundary not in BOUNDARIES:
+        raise ValueError(f"boundary must be one of {BOUNDARIES}, got {boundary!r}")
+    N, M = shape
+    n_cells = N * M
+    rows_idx, cols_idx = np.indices(shape)
+    rows_idx, cols_idx = rows_idx.ravel(), cols_idx.ravel()
+    cell = np.arange(n_cells)
+
+    src, dst = [cell], [cell]  # self loop: the neighbourhood includes the cell
+    for di, dj in NEIGHBOR_OFFSETS[neighbors]:
+        ni, nj = rows_idx + di, cols_idx + dj
+        if boundary == "periodic":
+            ni, nj = ni % N, nj % M
+            valid = np.ones(n_cells, dtype=bool)
+        else:
+            valid = (ni >= 0) & (ni < N) & (nj >= 0) & (nj < M)
+        src.append(cell[valid])
+        dst.append(ni[valid] * M + nj[valid])
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    adjacency = sp.csr_matrix((np.ones(len(src)), (src, dst)), shape=(n_cells, n_cells))
+
+    if boundary == "dirichlet":
+        size = np.full(n_cells, len(NEIGHBOR_OFFSETS[neighbors]) + 1.0)
+    else:
+        size = np.asarray(adjacency.sum(axis=1)).ravel()
+    return (sp.diags(1.0 / size) @ adjacency - sp.identity(n_cells)).tocsr()
+
+
+def linear_operator(k3, shape, coupling=0.1, neighbors=4, boundary="neumann", dtype=np.float64):
+    """A with dV/dt = A @ V: coupling * L - diag(k3); CSR in float64, DIA otherwise."""
+    L = coupling_operator(shape, neighbors, boundary) * coupling
+    A = (L - sp.diags(_cell_array(k3, shape))).tocsr().astype(dtype, copy=False)
+    if np.dtype(dtype) != np.float64:
+        A = A.todia()  # grid stencils are banded: no index arrays, faster float32 matvec
+        if not (A.offsets == 0).any():  # all-zero main diagonal (no coupling, 1 x 1 grid)
+            n = A.shape[1]  # keep the row anyway: TissueBuffers.operator writes -k3 into it
+            A = sp.dia_matrix((np.vstack([A.data.reshape(-1, n), np.zeros((1, n), A.dtype)]),
+                               np.append(A.offsets, 0)), shape=A.shape)
+    return A
+
+
+def _cell_array(value, shape):
+    return np.ascontiguousarray(np.broadcast_to(np.asarray(value, dtype=float), shape)).ravel()
+
+
+class TissueBuffers:
+    """Preallocated structure-of-arrays state of a flat tissue in one precision.
+
+    X, V, k1, k2 and the Euler scratch dX are contiguous (n_cells,) rows of
+    one dtype block. Passing the same buffers to several runs reuses them;
+    the grids a run returns are then views that the next run overwrites.
+    In reduced precision the DIA operator is kept as well: later runs on the
+    same grid and coupling only rewrite its main diagonal with -k3.
+    """
+
+    def __init__(self, n_cells, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.block = np.empty((5, n_cells), self.dtype)
+        self.X, self.V, self.k1, self.k2, self.dX = self.block
+        self._operator = (None, None, None)  # (key, L, A)
+
+    def __len__(self):
+        return self.block.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.block.nbytes
+
+    def operator(self, k3, shape, coupling, neighbors, boundary):
+        """linear_operator for these buffers, reusing the stored one when possible."""
+        if self.dtype == np.float64:
+            return linear_operator(k3, shape, coupling, neighbors, boundary)
+        key = (shape, coupling, neighbors, boundary)
+        if self._operator[0] != key:
+            L = linear_operator(0.0, shape, coupling, neighbors, boundary, self.dtype)
+            self._operator = (key, L, L.copy())
+        _, L, A = self._operator
+        np.copyto(A.data, L.data)
+        main = A.data[np.flatnonzero(A.offsets == 0)[0]]
+        np.subtract(main.reshape(shape), np.broadcast_to(k3, shape), out=main.reshape(shape),
+                    casting="unsafe")
+        return A
+
+
+def _check_precision(method, dtype, buffers):
+    if method == "bdf" and np.dtype(dtype if buffers is None else buffers.dtype) != np.float64:
+        raise ValueError("method='bdf' integrates in float64 only")
+
+
+def _prepare(k1, k2, k3, shape, y0, coupling, neighbors, boundary, dtype=np.float64,
+             buffers=None):
+    """Per-cell parameters and state filled into buffers, plus the linear V operator A."""
+    n_cells = shape[0] * shape[1]
+    if buffers is None:
+        buffers = TissueBuffers(n_cells, dtype)
+    elif len(buffers) != n_cells:
+        raise ValueError(f"buffers hold {len(buffers)} cells, the grid has {n_cells}")
+    for out, value in ((buffers.k1, k1), (buffers.k2, k2), (buffers.X, y0[0]), (buffers.V, y0[1])):
+        np.copyto(out.reshape(shape), np.broadcast_to(value, shape), casting="unsafe")
+    return buffers, buffers.operator(k3, shape, coupling, neighbors, boundary)
+
+
+def _euler_step(k1, k2, A, X, V, dX, dt, blocked=None, level=0.0):
+    """One in-place explicit Euler step of the whole grid; returns dV/dt before the step.
+
+    With blocked, a fraction `level` of the per-cell rate k3 * region is
+    removed for this step (time-varying channel block). dt and level are
+    Python floats so float32 state stays float32.
+    """
+    # dX = (k1 - k2*X) * V, evaluated on the old state before V moves
+    np.multiply(k2, X, out=dX)
+    np.subtract(k1, dX, out=dX)
+    dX *= V
+    dVdt = A @ V
+    if blocked is not None and level:
+        dVdt += level * blocked * V
+    dX *= dt
+    X += dX
+    V += dt * dVdt
+    return dVdt
+
+
+def _bdf_solve(k1, k2, A, X, V, t_span, t_eval=None, events=None, rtol=1e-6, atol=1e-9,
+               blocked=None, level=None):
+    n_cells = len(X)
+    if blocked is None:
+        level = lambda tt: 0.0
+        blocked = np.zeros(n_cells)
+
+    def rhs(tt, y):
+        Xc, Vc = y[:n_cells], y[n_cells:]
+        return np.concatenate([(k1 - k2 * Xc) * Vc, A @ Vc + level(tt) * blocked * Vc])
+
+    def jac(tt, y):
+        Xc, Vc = y[:n_cells], y[n_cells:]
+        return sp.bmat([[sp.diags(-k2 * Vc), sp.diags(k1 - k2 * Xc)],
+                        [None, A + sp.diags(level(tt) * blocked)]], format="csc")
+
+    sol = solve_ivp(rhs, t_span, np.concatenate([X, V]), method="BDF", jac=jac,
+                    t_eval=t_eval, events=events, rtol=rtol, atol=atol)
+    if not sol.success:
+        raise RuntimeError(f"solve_ivp failed: {sol.message}")
+    return sol
+
+
+def simulate_coupled_tissue(k1, k2, k3, shape, t, y0=(1.0, 1.0), coupling=0.1,
+                            neighbors=4, boundary="neumann", method="euler",
+                            rtol=1e-6, atol=1e-9, inhibition=None, region=1.0, store=None,
+                            dtype=np.float64, buffers=None):
+    """Advance an N x M coupled tissue over the time grid t; returns final (X, V) grids.
+
+    k1, k2, k3 and the initial X0, V0 in y0 are scalars or per-cell arrays
+    broadcastable to shape. method="euler" takes one whole-grid explicit Euler
+    step per interval of t (figure4 behaviour; stable for dt*(k3 + 2*coupling) < 2).
+    method="bdf" integrates adaptively with solve_ivp and a sparse Jacobian.
+
+    inhibition (one value per point of t) makes the block time-varying:
+    k3_cell(t) = k3 * (1 - inhibition(t) * region), region being a per-cell
+    weight or drug mask.
+
+    store (a trajectory_store.TrajectoryWriter on the same t) receives every
+    frame of X and V as it is computed, so full trajectories of grids too
+    large for RAM end up on disk; with method="bdf" the solver is restarted
+    every store.chunk_steps points to keep the dense output bounded.
+
+    dtype (np.float64 or np.float32) is the precision of the Euler state and
+    operator; buffers (a TissueBuffers for this grid) is reused instead of
+    allocating, and then fixes the precision. method="bdf" is float64 only.
+    """
+    shape = tuple(shape)
+    t = np.asarray(t, dtype=float)
+    if store is not None and len(store.t) != len(t):
+        raise ValueError("store must be created on the same time grid t")
+    _check_precision(method, dtype, buffers)
+    buffers, A = _prepare(k1, k2, k3, shape, y0, coupling, neighbors, boundary, dtype, buffers)
+    k1, k2, X, V = buffers.k1, buffers.k2, buffers.X, buffers.V
+    blocked = None
+    if inhibition is not None:
+        inhibition = np.asarray(inhibition, dtype=float)
+        if inhibition.shape != t.shape:
+            raise ValueError("inhibition needs one value per time point")
+        blocked = (_cell_array(k3, shape) * _cell_array(region, shape)).astype(buffers.dtype)
+
+    if store is not None:
+        store.append(X=X, V=V)
+
+    if method == "euler":
+        for i, dt in enumerate(np.diff(t).tolist()):
+            level = 0.0 if blocked is None else float(inhibition[i])
+            _euler_step(k1, k2, A, X, V, buffers.dX, dt, blocked, level)
+            if store is not None:
+                store.append(X=X, V=V)
+        if store is not None:
+            store.flush()
+        return X.reshape(shape), V.reshape(shape)
+
+    if method != "bdf":
+        raise ValueError(f"unknown method {method!r}")
+    level = None if blocked is None else (lambda tt: np.interp(tt, t, inhibition))
+    n_cells = len(X)
+    if store is None:
+        y_end = _bdf_solve(k1, k2, A, X, V, (t[0], t[-1]), t[-1:], rtol=rtol, atol=atol,
+                           blocked=blocked, level=level).y[:, -1]
+        return y_end[:n_cells].reshape(shape), y_end[n_cells:].reshape(shape)
+
+    for start in range(0, len(t) - 1, store.chunk_steps):
+        segment = t[start:start + store.chunk_steps + 1]
+        sol = _bdf_solve(k1, k2, A, X, V, (segment[0], segment[-1]), segment[1:], rtol=rtol,
+                         atol=atol, blocked=blocked, level=level)
+        for y in sol.y.T:
+            store.append(X=y[:n_cells], V=y[n_cells:])
+        X, V = sol.y[:n_cells, -1], sol.y[n_cells:, -1]
+    store.flush()
+    return X.reshape(shape), V.reshape(shape)
+
+
+def coupled_steady_state(k1, k2, k3, shape, y0=(1.0, 1.0), coupling=0.1, neighbors=4,
+                         boundary="neumann", tol=1e-6, t_max=1e5, dt=0.1, check_every=10,
+                         checkpoint_every=None, method="euler", rtol=1e-6, atol=1e-9,
+                         dtype=np.float64, buffers=None):
+    """Run the coupled tissue until max |dV/dt| < tol instead of to a fixed horizon.
+
+    Returns (X, V, t_end, checkpoints); only the current state is held in
+    memory and checkpoints is a list of (t, V grid) pairs taken every
+    checkpoint_every time units (empty when None). method="euler" steps with
+    dt and tests convergence every check_every steps; method="bdf" integrates
+    adaptively with a terminal convergence event. t_max caps the run.
+    dtype and buffers are as in simulate_coupled_tissue; with float32 state,
+    tol should stay well above float32 resolution of V (~1e-7 * |V|).
+    """
+    shape = tuple(shape)
+    _check_precision(method, dtype, buffers)
+    buffers, A = _prepare(k1, k2, k3, shape, y0, coupling, neighbors, boundary, dtype, buffers)
+    k1, k2, X, V = buffers.k1, buffers.k2, buffers.X, buffers.V
+    n_cells = len(X)
+    checkpoints = []
+
+    if method == "bdf":
+        def converged(tt, y):
+            return np.abs(A @ y[n_cells:]).max() - tol
+        converged.terminal = True
+
+        # Only checkpoint times are kept (not every internal step), plus t_max for
+        # the final state when the run does not converge
+        t_eval = [] if checkpoint_every is None else np.arange(0.0, t_max, checkpoint_every)
+        t_eval = np.append(t_eval, t_max)
+        if converged(0.0, np.concatenate([X, V])) <= 0:
+            return X.reshape(shape), V.reshape(shape), 0.0, checkpoints
+        sol = _bdf_solve(k1, k2, A, X, V, (0.0, t_max), t_eval, converged, rtol, atol)
+        checkpoints = [(tt, y[n_cells:].reshape(shape))
+                       for tt, y in zip(sol.t, np.transpose(sol.y)) if tt < t_max]
+        y_end = sol.y_events[0][0] if sol.status == 1 else sol.y[:, -1]
+        t_end = sol.t_events[0][0] if sol.status == 1 else sol.t[-1]
+        return y_end[:n_cells].reshape(shape), y_end[n_cells:].reshape(shape), t_end, checkpoints
+
+    if method != "euler":
+        raise ValueError(f"unknown method {method!r}")
+    dt = float(dt)
+    n_steps = int(np.ceil(t_max / dt))
+    save_every = None if checkpoint_every is None else max(1, int(round(checkpoint_every / dt)))
+    step = 0
+    while step < n_steps:
+        if save_every is not None and step % save_every == 0:
+            checkpoints.append((step * dt, V.reshape(shape).copy()))
+        if step % check_every == 0 and np.abs(A @ V).max() < tol:
+            break
+        _euler_step(k1, k2, A, X, V, buffers.dX, dt)
+        step += 1
+    return X.reshape(shape), V.reshape(shape), step * dt, checkpoints
@@ -1,4 +1,4 @@
-print("""
+ABSTRACT = """
 ABSTRACT
 We computationally repurpose 1980s pharmacology (amiloride, propranolol) 
 in Michael Levin's bioelectric agency framework. Multiscale QSP/ABM 
@@ -6,4 +6,8 @@ simulations predict tissue voltage gradients and collective decision
 disruption in virtual xenobot/planarian assays (Figures 1-5). This 
 lab-free pipeline reveals latent regenerative potentials of legacy 
 drugs, bridging reductionist mechanisms with organismal agency.
-""")
+"""
+
+
+if __name__ == "__main__":
+    print(ABSTRACT)
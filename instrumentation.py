@@ -0,0 +1,169 @@
+"""Opt-in profiling of the solver and GA hot paths.
+
+Nothing is recorded unless a Profile is active:
+
+    with profiling() as profile:
+        instrument_toolbox(toolbox)
+        pop, logbook = algorithms.eaSimple(pop, toolbox, ...)
+    profile.save("run_profile.json", logbook)
+
+While active, the solver counts RHS invocations and collects odeint's
+full_output statistics (nfe, nje, steps, method switches) as well as
+solve_ivp's nfev / njev, and closed-form and tissue dedup counts. An
+instrumented toolbox times evaluate (the map call), select, mate and mutate
+per generation. When no profile is active, the hooks cost one global lookup
+per solver call, and uninstrumented toolboxes are untouched. Counters from
+process-pool workers are not collected; only the parent's wall times are.
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+_ACTIVE = None
+
+
+def active():
+    """The active Profile, or None when instrumentation is off."""
+    return _ACTIVE
+
+
+class Profile:
+    """Counters, total stage times and per-generation stage times of one run."""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.counters = defaultdict(int)
+        self.totals = defaultdict(float)
+        self.generations = [defaultdict(float)]
+        self._start = time.perf_counter()
+
+    def count(self, name, n=1):
+        self.counters[name] += int(n)
+
+    def add_time(self, name, seconds):
+        self.totals[name] += seconds
+        self.generations[-1][name] += seconds
+
+    def next_generation(self):
+        if self.generations[-1]:
+            self.generations.append(defaultdict(float))
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def to_dict(self, logbook=None):
+        profile = {
+            "name": self.name,
+            "wall_s": time.perf_counter() - self._start,
+            "counters": dict(self.counters),
+            "totals_s": dict(self.totals),
+            "generations": [dict(gen, gen=i) for i, gen in enumerate(self.generations) if gen],
+        }
+        if logbook is not None:
+            profile["logbook"] = [dict(row) for row in logbook]
+        return profile
+
+    def save(self, path, logbook=None):
+        """Write the profile (and the logbook rows, if given) as JSON, atomically."""
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(logbook), f, indent=1, default=float)
+        os.replace(tmp, path)
+
+
+@contextmanager
+def profiling(profile=None):
+    """Activate profile (a new Profile by default) for the duration of the block."""
+    global _ACTIVE
+    previous, _ACTIVE = _ACTIVE, profile if profile is not None else Profile()
+    try:
+        yield _ACTIVE
+    finally:
+        _ACTIVE = previous
+
+
+def count(name, n=1):
+    """Increment a counter on the active profile, if any."""
+    if _ACTIVE is not None:
+        _ACTIVE.count(name, n)
+
+
+@contextmanager
+def timer(name):
+    """Time a block into the active profile, if any."""
+    if _ACTIVE is None:
+        yield
+        return
+    with _ACTIVE.timer(name):
+        yield
+
+
+# =========================
+# Solver hooks
+# =========================
+
+def counted_rhs(model, profile):
+    """model wrapped to count its invocations into profile.counters["rhs_calls"]."""
+    @wraps(model)
+    def rhs(*args):
+        profile.counters["rhs_calls"] += 1
+        return model(*args)
+    return rhs
+
+
+def record_odeint(profile, info):
+    """Add odeint full_output statistics (cumulative arrays; last entry is the total)."""
+    profile.count("odeint.calls")
+    profile.count("odeint.nfe", info["nfe"][-1])
+    profile.count("odeint.nje", info["nje"][-1])
+    profile.count("odeint.steps", info["nst"][-1])
+    mused = info["mused"]
+    profile.count("odeint.method_switches", sum(a != b for a, b in zip(mused[:-1], mused[1:])))
+
+
+def record_solve_ivp(profile, sol):
+    profile.count("solve_ivp.calls")
+    profile.count("solve_ivp.nfev", sol.nfev)
+    profile.count("solve_ivp.njev", sol.njev)
+
+
+# =========================
+# DEAP toolbox hooks
+# =========================
+
+def _timed(name, func, new_generation=False):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _ACTIVE
+        if profile is None:
+            return func(*args, **kwargs)
+        if new_generation:
+            profile.next_generation()
+        with profile.timer(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def instrument_toolbox(toolbox, generation_start="select"):
+    """Time the toolbox's map (as "evaluate"), select, mate and mutate per generation.
+
+    generation_start names the operation that opens a generation: "select"
+    for eaSimple (select, vary, evaluate), "map" for loops that evaluate
+    first and select afterwards. toolbox.evaluate itself is left untouched,
+    so batched and cached maps still recognise it.
+    """
+    stages = {"map": "evaluate", "select": "select", "mate": "mate", "mutate": "mutate"}
+    if generation_start not in stages:
+        raise ValueError(f"generation_start must be one of {sorted(stages)}")
+    for attr, name in stages.items():
+        if hasattr(toolbox, attr):
+            setattr(toolbox, attr, _timed(name, getattr(toolbox, attr), attr == generation_start))
+    return toolbox
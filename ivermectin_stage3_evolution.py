@@ -1,154 +1,232 @@
+import argparse
+from functools import lru_cache
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
-from deap import base, creator, tools, algorithms
+from deap import tools
 import random
-
-# =========================
-# Load baseline & perturbed
-# =========================
-
-target_pattern = np.load('figure6_baseline_pattern.npy')   # baseline pattern
-perturbed_pattern = np.load('ivermectin_stage2_tissue_pattern.npy')  # 10x10
-
-# Ensure target_pattern is 2D and matches ivermectin tissue shape
-if target_pattern.ndim == 1:
-    target_pattern = np.tile(target_pattern, (perturbed_pattern.shape[0], 1))
-
-N = perturbed_pattern.shape[0]  # assumed 10
+import instrumentation
+from checkpoint import ea_simple, load_checkpoint
+from fitness_cache import FitnessCache
+from parallel_evolution import (hof_cutoff, make_stage3_toolbox, stage3_evaluate,
+                                run_parallel, run_islands)
+from multiresolution import default_levels, run_multiresolution
+from optimizers import OPTIMIZERS, optimize
+from plotting import pyplot, save_figure
+from population_eval import ivermectin_k3_scale
+from precision import PRECISIONS
+from tissue_sim import simulate_tissue
 
 # ================
 # Bioelectric model
 # ================
 
-def bioelectric_model(y, t, k1, k2, k3):
-    X, V = y
-    dXdt = k1 * V - k2 * X * V
-    dVdt = -k3 * V
-    return [dXdt, dVdt]
-
 t = np.linspace(0, 100, 2000)
 y0 = [1, 1]
 
 # =========================
-# DEAP evolutionary framework
+# Load baseline & perturbed
 # =========================
 
-# Define fitness & individual
-creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
-creator.create("Individual", list, fitness=creator.FitnessMin)
+@lru_cache(maxsize=None)
+def load_patterns():
+    """(target, perturbed, k3_scale), read from the stage-2 / figure-6 outputs on first use."""
+    target_pattern = np.load('figure6_baseline_pattern.npy')   # baseline pattern
+    perturbed_pattern = np.load('ivermectin_stage2_tissue_pattern.npy')  # 10x10
 
-toolbox = base.Toolbox()
-toolbox.register("attr_float", random.uniform, 0.5, 2.0)  # k1, k2, k3 bounds
-toolbox.register("individual", tools.initRepeat, creator.Individual,
-                 toolbox.attr_float, 3)
-toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    # Ensure target_pattern is 2D and matches ivermectin tissue shape
+    if target_pattern.ndim == 1:
+        target_pattern = np.tile(target_pattern, (perturbed_pattern.shape[0], 1))
 
-def evaluate(individual, target=target_pattern):
-    """Fitness = MSE between evolved tissue and target pattern (under fixed ivermectin)."""
-    k1, k2, k3 = individual
+    N = perturbed_pattern.shape[0]  # assumed 10
 
-    evolved_pattern = np.zeros((N, N))
+    # Left half: ivermectin fixed (2x Cl conductance), k3 scaled per cell
+    k3_scale = ivermectin_k3_scale(N, factor=2.0)
+    return target_pattern, perturbed_pattern, k3_scale
 
-    for i in range(N):
-        for j in range(N):
-            # Left half: ivermectin fixed (2x Cl conductance)
-            if j < N // 2:
-                k3_ivm = 0.01 * 2.0 * k3
-            else:
-                k3_ivm = 0.01 * k3
-
-            sol = odeint(bioelectric_model, y0, t, args=(k1, k2, k3_ivm))
-            evolved_pattern[i, j] = sol[-1, 1]
+# =========================
+# DEAP evolutionary framework
+# =========================
 
-    mse = np.mean((evolved_pattern.flatten() - target.flatten())**2)
-    return mse,
+def evaluate(individual, target=None):
+    """Fitness = MSE between evolved tissue and target pattern (under fixed ivermectin)."""
+    target_pattern, _, k3_scale = load_patterns()
+    return stage3_evaluate(individual, target_pattern if target is None else target,
+                           k3_scale, t, y0)
 
-toolbox.register("evaluate", evaluate)
-toolbox.register("mate", tools.cxBlend, alpha=0.5)
-toolbox.register("mutate", tools.mutGaussian, mu=0, sigma=0.2, indpb=0.2)
-toolbox.register("select", tools.selTournament, tournsize=3)
+def simulate_pattern_from_params(params):
+    return simulate_tissue(params, load_patterns()[2], t, y0)
 
 # ===========
 # Run evolution
 # ===========
 
-pop = toolbox.population(n=100)
-hof = tools.HallOfFame(3)
-stats = tools.Statistics(lambda ind: ind.fitness.values)
-stats.register("min", np.min)
-
-pop, logbook = algorithms.eaSimple(
-    pop, toolbox,
-    cxpb=0.5, mutpb=0.2, ngen=50,
-    stats=stats, halloffame=hof, verbose=True
-)
-
-# ==========================
-# Reconstruct best pattern & save
-# ==========================
-
-def simulate_pattern_from_params(params):
-    k1, k2, k3 = params
-    pattern = np.zeros((N, N))
-    for i in range(N):
-        for j in range(N):
-            if j < N // 2:
-                k3_ivm = 0.01 * 2.0 * k3
-            else:
-                k3_ivm = 0.01 * k3
-            sol = odeint(bioelectric_model, y0, t, args=(k1, k2, k3_ivm))
-            pattern[i, j] = sol[-1, 1]
-    return pattern
-
-best_params = np.array([list(ind) for ind in hof])
-np.save('ivermectin_stage3_parameters.npy', best_params)
-
-best_pattern = simulate_pattern_from_params(hof[0])
-np.save('ivermectin_stage3_best_pattern.npy', best_pattern)
-
-# ==========================
-# Plot 3-panel evolution figure
-# ==========================
-
-# Shared color limits for all three panels
-vmin = min(target_pattern.min(), perturbed_pattern.min(), best_pattern.min())
-vmax = max(target_pattern.max(), perturbed_pattern.max(), best_pattern.max())
-margin = 0.05 * (vmax - vmin if vmax > vmin else 1.0)
-vmin -= margin
-vmax += margin
-cmap = "viridis"
-
-fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 5))
-
-# Target (baseline)
-im1 = ax1.imshow(target_pattern, cmap=cmap, vmin=vmin, vmax=vmax)
-ax1.set_title('Target pattern\n(Baseline)')
-ax1.set_xlabel('Column')
-ax1.set_ylabel('Row')
-plt.colorbar(im1, ax=ax1, fraction=0.046, pad=0.04)
-
-# Perturbed (ivermectin)
-im2 = ax2.imshow(perturbed_pattern, cmap=cmap, vmin=vmin, vmax=vmax)
-ax2.set_title('Ivermectin-perturbed')
-ax2.set_xlabel('Column')
-ax2.set_ylabel('Row')
-plt.colorbar(im2, ax=ax2, fraction=0.046, pad=0.04)
-
-# Best evolved
-im3 = ax3.imshow(best_pattern, cmap=cmap, vmin=vmin, vmax=vmax)
-ax3.set_title(
-    f'Best evolved\n[k1={hof[0][0]:.2f}, k2={hof[0][1]:.2f}, k3={hof[0][2]:.2f}]'
-)
-ax3.set_xlabel('Column')
-ax3.set_ylabel('Row')
-plt.colorbar(im3, ax=ax3, fraction=0.046, pad=0.04)
-
-plt.tight_layout()
-plt.savefig('ivermectin_stage3_evolution.png', dpi=300, bbox_inches='tight')
-plt.show()
-
-print("✅ Ivermectin Stage 3 COMPLETE")
-print("   → ivermectin_stage3_parameters.npy")
-print("   → ivermectin_stage3_best_pattern.npy")
-print("   → ivermectin_stage3_evolution.png")
+def run_stage3(args):
+    """Evolve, save the best parameters / pattern and plot; returns the logbook."""
+    with instrumentation.timer("io"):
+        target_pattern, perturbed_pattern, k3_scale = load_patterns()
+        resume = load_checkpoint(args.checkpoint) if args.resume else None
+    checkpointing = {"checkpoint": args.checkpoint, "every": args.checkpoint_every,
+                     "resume": resume}
+    dtype = None if args.precision == "float64" else PRECISIONS[args.precision]
+    cache = None
+    if args.fitness_cache:
+        # Entries are only reused for the same problem, evaluator and precision
+        cache = FitnessCache(path=args.fitness_cache, config=dict(
+            target=target_pattern, k3_scale=k3_scale, t=t, y0=y0, evaluate=stage3_evaluate,
+            precision=args.precision))
+
+    if args.islands:
+        seed = 0 if args.seed is None else args.seed
+        islands, logbook, hof = run_islands(
+            target_pattern, k3_scale, t, y0, n_islands=args.islands,
+            island_size=max(1, 100 // args.islands), ngen=50,
+            migration_interval=args.migration_interval, seed=seed,
+            max_workers=args.workers or None, verbose=True)
+    elif args.optimizer != "ga":
+        result = optimize(args.optimizer, target_pattern, k3_scale, t, y0, seed=args.seed,
+                          verbose=True)
+        logbook, hof = result["logbook"], result["hof"]
+        print(f"{args.optimizer}: MSE {result['mse']:.6g} after {result['n_simulations']} simulations")
+    elif args.multires:
+        pop, logbook, hof = run_multiresolution(
+            target_pattern, k3_scale, t, y0, n=100, ngen=50, seed=args.seed,
+            levels=default_levels(target_pattern.shape, min_side=4), verbose=True)
+    elif args.workers:
+        pop, logbook, hof = run_parallel(target_pattern, k3_scale, t, y0, n=100, ngen=50,
+                                         seed=args.seed, max_workers=args.workers, verbose=True,
+                                         dtype=dtype, cache=cache, **checkpointing)
+    else:
+        if args.seed is not None:
+            random.seed(args.seed)
+        # Same operators as before; populations are evaluated in batches
+        hof = tools.HallOfFame(3)
+        cutoff = hof_cutoff(hof) if args.early_abort else None
+        toolbox = make_stage3_toolbox(target_pattern, k3_scale, t, y0, cutoff=cutoff, dtype=dtype,
+                                      cache=cache)
+        pop = toolbox.population(n=100)
+        stats = tools.Statistics(lambda ind: ind.fitness.values)
+        stats.register("min", np.min)
+
+        pop, logbook = ea_simple(
+            pop, toolbox,
+            cxpb=0.5, mutpb=0.2, ngen=50,
+            stats=stats, halloffame=hof, verbose=True, **checkpointing
+        )
+
+    # ==========================
+    # Reconstruct best pattern & save
+    # ==========================
+
+    if cache is not None:
+        with instrumentation.timer("io"):
+            cache.save()
+        print(f"Fitness cache: {cache.stats()}")
+    if dtype is not None:  # the hall of fame was ranked in reduced precision
+        print(f"{args.precision} best MSE {hof[0].fitness.values[0]:.6g}, "
+              f"float64 recheck {evaluate(hof[0])[0]:.6g}")
+    best_params = np.array([list(ind) for ind in hof])
+    best_pattern = simulate_pattern_from_params(hof[0])
+    with instrumentation.timer("io"):
+        np.save('ivermectin_stage3_parameters.npy', best_params)
+        np.save('ivermectin_stage3_best_pattern.npy', best_pattern)
+
+    # ==========================
+    # Plot 3-panel evolution figure
+    # ==========================
+
+    # Shared color limits for all three panels
+    vmin = min(target_pattern.min(), perturbed_pattern.min(), best_pattern.min())
+    vmax = max(target_pattern.max(), perturbed_pattern.max(), best_pattern.max())
+    margin = 0.05 * (vmax - vmin if vmax > vmin else 1.0)
+    vmin -= margin
+    vmax += margin
+    cmap = "viridis"
+
+    plt = pyplot()
+
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 5))
+
+    # Target (baseline)
+    im1 = ax1.imshow(target_pattern, cmap=cmap, vmin=vmin, vmax=vmax)
+    ax1.set_title('Target pattern\n(Baseline)')
+    ax1.set_xlabel('Column')
+    ax1.set_ylabel('Row')
+    plt.colorbar(im1, ax=ax1, fraction=0.046, pad=0.04)
+
+    # Perturbed (ivermectin)
+    im2 = ax2.imshow(perturbed_pattern, cmap=cmap, vmin=vmin, vmax=vmax)
+    ax2.set_title('Ivermectin-perturbed')
+    ax2.set_xlabel('Column')
+    ax2.set_ylabel('Row')
+    plt.colorbar(im2, ax=ax2, fraction=0.046, pad=0.04)
+
+    # Best evolved
+    im3 = ax3.imshow(best_pattern, cmap=cmap, vmin=vmin, vmax=vmax)
+    ax3.set_title(
+        f'Best evolved\n[k1={hof[0][0]:.2f}, k2={hof[0][1]:.2f}, k3={hof[0][2]:.2f}]'
+    )
+    ax3.set_xlabel('Column')
+    ax3.set_ylabel('Row')
+    plt.colorbar(im3, ax=ax3, fraction=0.046, pad=0.04)
+
+    plt.tight_layout()
+    with instrumentation.timer("io"):
+        save_figure('ivermectin_stage3_evolution.png', fig, bbox_inches='tight')
+
+    print("✅ Ivermectin Stage 3 COMPLETE")
+    print("   → ivermectin_stage3_parameters.npy")
+    print("   → ivermectin_stage3_best_pattern.npy")
+    print("   → ivermectin_stage3_evolution.png")
+    return logbook
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ivermectin stage 3 evolution")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="evaluate fitness batches on a process pool of this size")
+    parser.add_argument("--islands", type=int, default=0,
+                        help="island model with this many sub-populations (one process each)")
+    parser.add_argument("--migration-interval", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--optimizer", choices=sorted(OPTIMIZERS), default="ga",
+                        help="cmaes: DEAP CMA-ES; hybrid: short CMA-ES + gradient polish; "
+                             "surrogate: GA with RBF pre-screening of offspring")
+    parser.add_argument("--multires", action="store_true",
+                        help="start on a block-averaged grid and promote resolution on stagnation")
+    parser.add_argument("--early-abort", action="store_true",
+                        help="stop simulating individuals proven worse than the hall of fame")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write solver counters and per-generation stage timings here (JSON)")
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="snapshot the GA here every --checkpoint-every generations (.npz)")
+    parser.add_argument("--checkpoint-every", type=int, default=5)
+    parser.add_argument("--resume", action="store_true",
+                        help="continue bit-identically from the --checkpoint snapshot")
+    parser.add_argument("--fitness-cache", metavar="PATH",
+                        help="reuse fitnesses saved here by earlier runs and save new ones (.npz)")
+    parser.add_argument("--precision", choices=sorted(PRECISIONS), default="float64",
+                        help="float32: evaluate population batches in a reused float32 buffer")
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint PATH")
+    if args.checkpoint and (args.islands or args.multires or args.optimizer != "ga"):
+        parser.error("--checkpoint supports the eaSimple GA (serial or --workers) only")
+    if args.fitness_cache and (args.islands or args.multires or args.optimizer != "ga"):
+        parser.error("--fitness-cache supports the eaSimple GA (serial or --workers) only")
+    if args.early_abort and (args.workers or args.islands or args.multires
+                             or args.optimizer != "ga"):
+        parser.error("--early-abort supports the serial GA only")
+    if args.precision != "float64" and (args.islands or args.multires or args.early_abort
+                                        or args.optimizer != "ga"):
+        parser.error("--precision supports the eaSimple GA (serial or --workers) only")
+
+    if not args.profile:
+        run_stage3(args)
+        return
+    with instrumentation.profiling(instrumentation.Profile("ivermectin_stage3")) as profile:
+        logbook = run_stage3(args)
+    profile.save(args.profile, logbook)
+    print(f"   → {args.profile}")
+
+
+if __name__ == "__main__":
+    main()
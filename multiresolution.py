@@ -0,0 +1,139 @@
+"""Coarse-to-fine multiresolution GA for large tissue target patterns.
+
+Early generations score individuals on a block-averaged target, k3 map and
+thinned time grid. The resolution is promoted on a fixed schedule or when
+the best fitness stagnates, and the population is re-scored at each new
+level. Each generation the best individuals are also re-scored at full
+resolution into a separate hall of fame, so the reported optimum is always
+exact. Operators are the stage-3 ones (make_stage3_toolbox).
+"""
+import random
+
+import numpy as np
+from deap import algorithms, tools
+
+from fitness_cache import FitnessCache
+from parallel_evolution import make_stage3_toolbox
+from population_eval import evaluate_population
+
+
+def block_mean(a, factor):
+    """Average over factor-sized blocks along every axis; ragged edge blocks are averaged too."""
+    a = np.asarray(a, dtype=float)
+    if factor == 1:
+        return a
+    for axis in range(a.ndim):
+        starts = np.arange(0, a.shape[axis], factor)
+        sizes = np.diff(np.append(starts, a.shape[axis]))
+        shape = [1] * a.ndim
+        shape[axis] = len(sizes)
+        a = np.add.reduceat(a, starts, axis=axis) / sizes.reshape(shape)
+    return a
+
+
+def coarse_time(t, factor):
+    """Every factor-th point of t, always keeping the final time."""
+    t = np.asarray(t, dtype=float)
+    coarse = t[::factor]
+    return coarse if coarse[-1] == t[-1] else np.append(coarse, t[-1])
+
+
+def default_levels(shape, min_side=16):
+    """Space factors from coarsest to 1 (halving), keeping the coarsest side >= min_side."""
+    factors = [1]
+    while min(shape) // (factors[-1] * 2) >= min_side:
+        factors.append(factors[-1] * 2)
+    return factors[::-1]
+
+
+def level_problem(target, k3_scale, t, factor, time_factor=None):
+    """(target, k3_scale, t) at one resolution level."""
+    time_factor = factor if time_factor is None else time_factor
+    return block_mean(target, factor), block_mean(k3_scale, factor), coarse_time(t, time_factor)
+
+
+def run_multiresolution(target, k3_scale, t, y0=(1, 1), n=100, ngen=50, cxpb=0.5, mutpb=0.2,
+                        levels=None, promote_every=None, patience=5, tol=1e-3, hof_size=3,
+                        seed=None, verbose=False):
+    """eaSimple-style evolution that starts coarse and promotes resolution.
+
+    levels is a list of space factors from coarsest to finest (default:
+    default_levels(target.shape)); the time grid is thinned by the same factor.
+    A level is promoted after promote_every generations, or, when that is None,
+    once the best coarse fitness has improved by less than tol (relative) for
+    patience generations. Returns (pop, logbook, hof); hof holds full-resolution
+    fitnesses and logbook rows carry gen, level, factor, nevals, min and full_min.
+    """
+    if seed is not None:
+        random.seed(seed)
+    target = np.asarray(target, dtype=float)
+    k3_scale = np.broadcast_to(np.asarray(k3_scale, dtype=float), target.shape)
+    levels = list(levels or default_levels(target.shape))
+    if levels[-1] != 1:
+        levels.append(1)
+
+    def toolbox_for(level):
+        problem = level_problem(target, k3_scale, t, levels[level])
+        return make_stage3_toolbox(*problem, y0=y0)
+
+    full_scores = FitnessCache(maxsize=10_000)
+
+    def evaluate_invalid(pop):
+        invalid = [ind for ind in pop if not ind.fitness.valid]
+        for ind, fit in zip(invalid, toolbox.map(toolbox.evaluate, invalid)):
+            ind.fitness.values = fit
+        return len(invalid)
+
+    def rescore(pop):
+        # elites survive many generations unchanged; only new genomes hit the full grid
+        elite = [toolbox.clone(ind) for ind in tools.selBest(pop, hof_size)]
+        todo = [ind for ind in elite if full_scores.get(ind) is None]
+        if todo:
+            for ind, mse in zip(todo, evaluate_population(todo, target, k3_scale, t, y0)):
+                full_scores.put(ind, (mse,))
+        for ind in elite:
+            ind.fitness.values = full_scores.get(ind)
+        hof.update(elite)
+
+    level = 0
+    toolbox = toolbox_for(level)
+    hof = tools.HallOfFame(hof_size)
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "level", "factor", "nevals", "min", "full_min"]
+
+    pop = toolbox.population(n=n)
+    nevals = evaluate_invalid(pop)
+    rescore(pop)
+    best = min(ind.fitness.values[0] for ind in pop)
+    since_level, stale = 0, 0
+
+    def record(gen):
+        logbook.record(gen=gen, level=level, factor=levels[level], nevals=nevals,
+                       min=min(ind.fitness.values[0] for ind in pop),
+                       full_min=hof[0].fitness.values[0])
+        if verbose:
+            print(logbook.stream)
+
+    record(0)
+    for gen in range(1, ngen + 1):
+        since_level += 1
+        due = since_level >= promote_every if promote_every else stale >= patience
+        if due and level < len(levels) - 1:
+            level += 1
+            toolbox = toolbox_for(level)
+            for ind in pop:
+                del ind.fitness.values
+            evaluate_invalid(pop)
+            best = min(ind.fitness.values[0] for ind in pop)
+            since_level, stale = 0, 0
+
+        offspring = algorithms.varAnd(toolbox.select(pop, len(pop)), toolbox, cxpb, mutpb)
+        nevals = evaluate_invalid(offspring)
+        pop[:] = offspring
+        rescore(pop)
+
+        current = min(ind.fitness.values[0] for ind in pop)
+        stale = stale + 1 if current > best - tol * abs(best) else 0
+        best = min(best, current)
+        record(gen)
+    return pop, logbook, hof
@@ -0,0 +1,153 @@
+"""Pluggable optimizers for the stage-3 parameter fit.
+
+Every optimizer minimises the stage-3 MSE between the tissue pattern of a
+genome [k1, k2, k3] and the target, and returns a dict:
+
+    params         best genome found
+    mse            its exact MSE
+    n_simulations  genomes simulated (batched evaluations and gradient calls)
+    logbook        per-generation DEAP logbook of the population-based search
+    hof            hall of fame of creator.Stage3Individual with exact fitness
+
+"ga" is the existing eaSimple setup, "cmaes" is DEAP's CMA-ES strategy on the
+same batched evaluate, and "hybrid" runs CMA-ES briefly and then polishes the
+hall of fame with L-BFGS-B. The polish uses exact gradients from the forward
+sensitivity equations (bioelectric_solver.final_sensitivities). "surrogate"
+is eaSimple with RBF pre-screening of offspring (surrogate.py).
+
+    result = optimize("hybrid", target, k3_scale, t, y0, seed=0)
+"""
+import random
+
+import numpy as np
+from deap import algorithms, cma, creator, tools
+from scipy.optimize import minimize
+
+from bioelectric_solver import final_sensitivities
+from parallel_evolution import _min_stats, make_stage3_toolbox
+from population_eval import evaluate_population
+from surrogate import run_surrogate_ga
+
+# name -> optimizer(target, k3_scale, t, y0, **options) -> result dict
+OPTIMIZERS = {}
+
+
+def register_optimizer(name):
+    def decorator(func):
+        OPTIMIZERS[name] = func
+        return func
+    return decorator
+
+
+def optimize(method, target, k3_scale, t, y0=(1, 1), **options):
+    """Run the optimizer registered under method; options go to that optimizer."""
+    if method not in OPTIMIZERS:
+        raise ValueError(f"unknown optimizer {method!r}; have {sorted(OPTIMIZERS)}")
+    return OPTIMIZERS[method](target, k3_scale, t, y0, **options)
+
+
+def _result(hof, logbook, n_simulations):
+    return {"params": np.array(hof[0], dtype=float), "mse": hof[0].fitness.values[0],
+            "n_simulations": int(n_simulations), "logbook": logbook, "hof": hof}
+
+
+def _nevals(logbook):
+    return sum(row["nevals"] for row in logbook)
+
+
+# =========================
+# Gradient of the MSE
+# =========================
+
+def mse_and_gradient(params, target, k3_scale, t, y0=(1, 1)):
+    """Stage-3 MSE of one genome and its exact gradient with respect to (k1, k2, k3).
+
+    Each distinct k3_scale value is integrated once with its sensitivities.
+    The chain rule through k3_cell = k3 * k3_scale gives the k3 component.
+    """
+    k1, k2, k3 = (float(p) for p in params)
+    scale = np.asarray(k3_scale, dtype=float).ravel()
+    target = np.broadcast_to(np.asarray(target, dtype=float), np.shape(k3_scale)).ravel()
+    scales, cell_scale = np.unique(scale, return_inverse=True)
+
+    state, sens = final_sensitivities(y0, t, k1, k2, k3 * scales)
+    V = state[:, 1][cell_scale]
+    dV = sens[:, 1, :][cell_scale]
+    dV[:, 2] *= scale
+    resid = V - target
+    return float(np.mean(resid ** 2)), 2.0 * resid @ dV / resid.size
+
+
+def polish(genome, target, k3_scale, t, y0=(1, 1), maxiter=100, gtol=1e-12):
+    """L-BFGS-B from genome using sensitivity gradients; returns (params, mse, n_calls)."""
+    res = minimize(mse_and_gradient, np.asarray(genome, dtype=float), jac=True,
+                   args=(target, k3_scale, t, y0), method="L-BFGS-B",
+                   options={"maxiter": maxiter, "gtol": gtol, "ftol": 1e-15})
+    return res.x, float(res.fun), res.nfev
+
+
+# =========================
+# Optimizers
+# =========================
+
+@register_optimizer("ga")
+def run_ga(target, k3_scale, t, y0=(1, 1), n=100, ngen=50, cxpb=0.5, mutpb=0.2, seed=None,
+           hof_size=3, verbose=False):
+    """The stage-3 eaSimple (cxBlend, mutGaussian, tournament of 3)."""
+    if seed is not None:
+        random.seed(seed)
+    toolbox = make_stage3_toolbox(target, k3_scale, t, y0)
+    hof = tools.HallOfFame(hof_size)
+    _, logbook = algorithms.eaSimple(toolbox.population(n=n), toolbox, cxpb=cxpb, mutpb=mutpb,
+                                     ngen=ngen, stats=_min_stats(), halloffame=hof,
+                                     verbose=verbose)
+    return _result(hof, logbook, _nevals(logbook))
+
+
+@register_optimizer("cmaes")
+def run_cmaes(target, k3_scale, t, y0=(1, 1), ngen=30, centroid=(1.25, 1.25, 1.25), sigma=0.5,
+              lambda_=None, seed=None, hof_size=3, verbose=False):
+    """DEAP CMA-ES (eaGenerateUpdate) started from the middle of the GA's init bounds."""
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)  # cma.Strategy samples with numpy's global generator
+    toolbox = make_stage3_toolbox(target, k3_scale, t, y0)
+    kwargs = {} if lambda_ is None else {"lambda_": lambda_}
+    strategy = cma.Strategy(centroid=list(centroid), sigma=sigma, **kwargs)
+    toolbox.register("generate", strategy.generate, creator.Stage3Individual)
+    toolbox.register("update", strategy.update)
+    hof = tools.HallOfFame(hof_size)
+    _, logbook = algorithms.eaGenerateUpdate(toolbox, ngen=ngen, stats=_min_stats(),
+                                             halloffame=hof, verbose=verbose)
+    return _result(hof, logbook, _nevals(logbook))
+
+
+@register_optimizer("hybrid")
+def run_hybrid(target, k3_scale, t, y0=(1, 1), ngen=10, global_method="cmaes", maxiter=100,
+               seed=None, hof_size=3, verbose=False, **global_options):
+    """A short global search, then L-BFGS-B polishing of every hall-of-fame member."""
+    result = optimize(global_method, target, k3_scale, t, y0, ngen=ngen, seed=seed,
+                      hof_size=hof_size, verbose=verbose, **global_options)
+    n_simulations = result["n_simulations"]
+    polished = []
+    for member in result["hof"]:
+        params, mse, calls = polish(member, target, k3_scale, t, y0, maxiter)
+        n_simulations += calls
+        ind = creator.Stage3Individual(params.tolist())
+        # re-score on the production evaluate so hof fitnesses are comparable
+        ind.fitness.values = (float(evaluate_population([params], target, k3_scale, t, y0)[0]),)
+        polished.append(ind)
+        if verbose:
+            print(f"polish: {mse:.6g} after {calls} gradient evaluations")
+    hof = tools.HallOfFame(hof_size)
+    hof.update(polished + list(result["hof"]))
+    return _result(hof, result["logbook"], n_simulations + len(polished))
+
+
+@register_optimizer("surrogate")
+def run_surrogate(target, k3_scale, t, y0=(1, 1), seed=None, hof_size=3, verbose=False,
+                  **options):
+    """The stage-3 GA with only surrogate-selected offspring simulated."""
+    _, logbook, hof = run_surrogate_ga(target, k3_scale, t, y0, seed=seed, hof_size=hof_size,
+                                       verbose=verbose, **options)
+    return _result(hof, logbook, _nevals(logbook))
@@ -0,0 +1,202 @@
+"""Parallel runners for the stage-3 ivermectin evolution.
+
+run_parallel keeps a single eaSimple population and farms fitness batches
+out to a process pool. run_islands evolves several sub-populations on
+separate processes and migrates the best individuals around a ring every
+migration_interval generations. Both are reproducible under a fixed seed:
+variation happens in seeded random streams and evaluation is deterministic.
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from deap import base, creator, tools, algorithms
+
+import instrumentation
+from checkpoint import ea_simple
+from fitness_cache import register_cached_map
+from population_eval import (PopulationWorkspace, evaluate_population, register_batched_map,
+                             register_bounded_map)
+from tissue_sim import simulate_tissue
+
+
+def ensure_deap_types():
+    """Create the stage-3 DEAP types once per process.
+
+    creator.create at import time re-runs (and warns) in every spawned worker;
+    guarding it keeps Individuals picklable across processes. The names are
+    stage-3 specific so other DEAP scripts cannot replace them, and types
+    left with other fitness weights are recreated, never reused.
+    """
+    existing = getattr(creator, "Stage3Individual", None)
+    if existing is None or existing.fitness.weights != (-1.0,):
+        creator.create("Stage3FitnessMin", base.Fitness, weights=(-1.0,))
+        creator.create("Stage3Individual", list, fitness=creator.Stage3FitnessMin)
+
+
+def stage3_evaluate(individual, target, k3_scale, t, y0=(1, 1)):
+    """Fitness = MSE between evolved tissue and target pattern (under fixed ivermectin)."""
+    pattern = simulate_tissue(individual, k3_scale, t, y0)
+    return float(np.mean((pattern - target) ** 2)),
+
+
+def make_stage3_toolbox(target, k3_scale, t, y0=(1, 1), executor=None, n_chunks=None,
+                        cache=None, cutoff=None, dtype=None):
+    """Stage-3 toolbox (bounds and operators as in ivermectin_stage3_evolution.py).
+
+    Populations are evaluated in batches; with an executor the batches are
+    split into n_chunks pieces and evaluated on the pool. An optional
+    FitnessCache is consulted before any batch is simulated. While an
+    instrumentation profile is active the operators are timed per generation.
+    With a cutoff (number or callable, see hof_cutoff) populations are
+    evaluated with early abort instead; this runs in-process only.
+    dtype (e.g. np.float32) evaluates the batches in a PopulationWorkspace
+    of that precision, reused from generation to generation; pool workers
+    each reuse their own (see population_eval.process_workspace).
+    """
+    ensure_deap_types()
+    toolbox = base.Toolbox()
+    toolbox.register("attr_float", random.uniform, 0.5, 2.0)  # k1, k2, k3 bounds
+    toolbox.register("individual", tools.initRepeat, creator.Stage3Individual,
+                     toolbox.attr_float, 3)
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    toolbox.register("evaluate", stage3_evaluate, target=target, k3_scale=k3_scale, t=t, y0=y0)
+    toolbox.register("mate", tools.cxBlend, alpha=0.5)
+    toolbox.register("mutate", tools.mutGaussian, mu=0, sigma=0.2, indpb=0.2)
+    toolbox.register("select", tools.selTournament, tournsize=3)
+
+    if cutoff is not None:
+        if executor is not None or dtype is not None:
+            raise ValueError("early-abort evaluation runs in-process and in float64 only")
+        register_bounded_map(toolbox, target, k3_scale, t, y0, cutoff)
+    else:
+        workspace = None if dtype is None else PopulationWorkspace(dtype)
+        batch = partial(evaluate_population, target=target, k3_scale=k3_scale, t=t, y0=y0,
+                        workspace=workspace)
+        register_batched_map(toolbox, batch, executor, n_chunks)
+    if cache is not None:
+        register_cached_map(toolbox, cache)
+    if instrumentation.active() is not None:
+        instrumentation.instrument_toolbox(toolbox)
+    return toolbox
+
+
+def hof_cutoff(hof):
+    """Cutoff callable for early abort: the worst hall-of-fame MSE once the hall is full.
+
+    Individuals proven worse than it could never enter the hall of fame, so
+    the hall only ever holds exact fitnesses.
+    """
+    def cutoff():
+        return hof[-1].fitness.values[0] if len(hof) == hof.maxsize else np.inf
+    return cutoff
+
+
+def _min_stats():
+    stats = tools.Statistics(lambda ind: ind.fitness.values)
+    stats.register("min", np.min)
+    return stats
+
+
+# =========================
+# Process-pool eaSimple
+# =========================
+
+def run_parallel(target, k3_scale, t, y0=(1, 1), n=100, ngen=50, cxpb=0.5, mutpb=0.2,
+                 seed=None, max_workers=None, hof_size=3, verbose=False, checkpoint=None,
+                 every=10, resume=None, dtype=None, cache=None):
+    """eaSimple with population fitness batches evaluated on a process pool.
+
+    Returns (pop, logbook, hof); identical to a serial run with the same seed.
+    checkpoint / every / resume are passed to checkpoint.ea_simple, dtype and
+    cache (a FitnessCache, consulted in this process) to make_stage3_toolbox.
+    """
+    if seed is not None:
+        random.seed(seed)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=ensure_deap_types) as pool:
+        toolbox = make_stage3_toolbox(target, k3_scale, t, y0, executor=pool,
+                                      n_chunks=pool._max_workers, cache=cache, dtype=dtype)
+        pop = toolbox.population(n=n)
+        hof = tools.HallOfFame(hof_size)
+        pop, logbook = ea_simple(pop, toolbox, cxpb=cxpb, mutpb=mutpb, ngen=ngen,
+                                 stats=_min_stats(), halloffame=hof, verbose=verbose,
+                                 checkpoint=checkpoint, every=every, resume=resume)
+    return pop, logbook, hof
+
+
+# =========================
+# Island model
+# =========================
+
+def _island_seed(seed, epoch, island):
+    return int(np.random.SeedSequence([seed, epoch, island]).generate_state(1)[0])
+
+
+def _evolve_island(genomes, fitnesses, seed, ngen, cxpb, mutpb, problem):
+    """Worker: run ngen generations of eaSimple on one island."""
+    random.seed(seed)
+    toolbox = make_stage3_toolbox(**problem)
+    pop = [creator.Stage3Individual(g) for g in genomes]
+    for ind, fit in zip(pop, fitnesses):
+        ind.fitness.values = (fit,)
+    pop, logbook = algorithms.eaSimple(pop, toolbox, cxpb=cxpb, mutpb=mutpb, ngen=ngen,
+                                       stats=_min_stats(), verbose=False)
+    fits = np.array([ind.fitness.values[0] for ind in pop])
+    return np.array(pop, dtype=float), fits, list(logbook)[1:]
+
+
+def run_islands(target, k3_scale, t, y0=(1, 1), n_islands=4, island_size=25, ngen=50,
+                migration_interval=5, n_migrants=2, cxpb=0.5, mutpb=0.2, seed=0,
+                max_workers=None, hof_size=3, verbose=False):
+    """Island-model evolution with ring migration of the best individuals.
+
+    Every migration_interval generations each island sends its n_migrants best
+    individuals to the next island, where they replace the worst ones.
+    Returns (islands, logbook, hof); logbook rows carry gen, island and min.
+    """
+    problem = dict(target=target, k3_scale=k3_scale, t=t, y0=y0)
+    random.seed(seed)
+    toolbox = make_stage3_toolbox(**problem)
+    islands = [toolbox.population(n=island_size) for _ in range(n_islands)]
+    for island in islands:
+        for ind, fit in zip(island, toolbox.map(toolbox.evaluate, island)):
+            ind.fitness.values = fit
+
+    hof = tools.HallOfFame(hof_size)
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "island", "nevals", "min"]
+    for i, island in enumerate(islands):
+        hof.update(island)
+        logbook.record(gen=0, island=i, nevals=len(island),
+                       min=min(ind.fitness.values[0] for ind in island))
+
+    gen, epoch = 0, 0
+    with ProcessPoolExecutor(max_workers=max_workers or n_islands,
+                             initializer=ensure_deap_types) as pool:
+        while gen < ngen:
+            steps = min(migration_interval, ngen - gen)
+            futures = [
+                pool.submit(_evolve_island, np.array(island, dtype=float),
+                            [ind.fitness.values[0] for ind in island],
+                            _island_seed(seed, epoch, i), steps, cxpb, mutpb, problem)
+                for i, island in enumerate(islands)
+            ]
+            for i, future in enumerate(futures):
+                with instrumentation.timer("islands.evolve"):
+                    genomes, fits, rows = future.result()
+                islands[i] = [creator.Stage3Individual(g) for g in genomes.tolist()]
+                for ind, fit in zip(islands[i], fits):
+                    ind.fitness.values = (float(fit),)
+                hof.update(islands[i])
+                for row in rows:
+                    logbook.record(gen=gen + row["gen"], island=i,
+                                   nevals=row["nevals"], min=row["min"])
+            gen += steps
+            epoch += 1
+            if gen < ngen and n_islands > 1:
+                with instrumentation.timer("islands.migrate"):
+                    tools.migRing(islands, n_migrants, tools.selBest, replacement=tools.selWorst)
+            if verbose:
+                print(f"gen {gen:4d} | best {hof[0].fitness.values[0]:.6g}")
+    return islands, logbook, hof
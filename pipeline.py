@@ -0,0 +1,279 @@
+"""Incremental runner for the figure pipeline.
+
+Each stage declares its script, command-line arguments, input files and
+output files. The artifact DAG follows from which stage produces each input.
+A stage's key hashes its script and every local module it imports
+(transitively), its arguments, and the contents of its input files. The stage
+is rerun only when that key differs from the one recorded in the manifest, or
+when one of its outputs is missing. Stages whose inputs are ready run
+concurrently, each as a subprocess.
+
+    python pipeline.py                 # bring every stage up to date
+    python pipeline.py stage3 -j 4     # one target and whatever it needs
+    python pipeline.py --dry-run       # list stale stages without running
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = ".pipeline_manifest.json"
+
+# name -> {"script", "args", "inputs", "outputs"}; inputs/outputs relative to the run directory
+STAGES = {}
+
+
+def register_stage(name, script, outputs, inputs=(), args=()):
+    """Declare a stage; inputs produced by other stages become DAG edges."""
+    STAGES[name] = {"script": script, "args": list(args), "inputs": list(inputs),
+                    "outputs": list(outputs)}
+
+
+register_stage("figure1", "bioelectric_scipy.py",
+               ["Figure1_single_cell_time_Vnorm.png", "ivermectin_stage1_dose_response.npy",
+                "ivermectin_stage1_dose_response.png"])
+register_stage("figure2", "figure2_sweep.py", ["figure2_dose_response.png"])
+register_stage("figure3", "pubchem_curation.py", ["figure3_amiloride.png"])
+register_stage("figure4", "figure4_tissue.py", ["figure4_tissue_abm.png"])
+register_stage("figure5", "figure5_propranolol.py", ["figure5.png"])
+register_stage("figure5_minimal", "figure5_minimal.py", ["figure5_propranolol.png"],
+               args=["--seed", "0"])
+register_stage("stage2", "ivermectin_stage2_tissue.py",
+               ["ivermectin_stage2_tissue_pattern.npy", "ivermectin_stage2_tissue.png"])
+register_stage("figure6_ga", "tissue_deap.py", ["figure6_fitness.csv"])
+register_stage("figure6_patterns", "figure6_patterns.py",
+               ["figure6_baseline_pattern.npy", "figure6_evolved_pattern.npy"])
+register_stage("figure6_fitness_plot", "plot_figure6.py", ["figure6_fitness.png"],
+               inputs=["figure6_fitness.csv"])
+register_stage("figure6_patterns_plot", "plot_figure6_patterns.py", ["figure6_patterns.png"],
+               inputs=["figure6_baseline_pattern.npy", "figure6_evolved_pattern.npy"])
+register_stage("stage3", "ivermectin_stage3_evolution.py",
+               ["ivermectin_stage3_parameters.npy", "ivermectin_stage3_best_pattern.npy",
+                "ivermectin_stage3_evolution.png"],
+               inputs=["figure6_baseline_pattern.npy", "ivermectin_stage2_tissue_pattern.npy"],
+               args=["--seed", "0"])
+
+
+# =========================
+# Content hashing
+# =========================
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def local_modules(script):
+    """The script plus every repository module it imports, transitively (sorted paths)."""
+    seen, todo = set(), [os.path.join(ROOT, script)]
+    while todo:
+        path = todo.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                candidate = os.path.join(ROOT, name.split(".")[0] + ".py")
+                if os.path.exists(candidate):
+                    todo.append(candidate)
+    return sorted(seen)
+
+
+def stage_key(name, workdir="."):
+    """sha256 over the stage's code, arguments and input file contents."""
+    stage = STAGES[name]
+    h = hashlib.sha256()
+    h.update(json.dumps([stage["script"], stage["args"]]).encode())
+    for path in local_modules(stage["script"]):
+        h.update(os.path.basename(path).encode())
+        h.update(_file_digest(path).encode())
+    for path in stage["inputs"]:
+        full = os.path.join(workdir, path)
+        h.update(path.encode())
+        h.update((_file_digest(full) if os.path.exists(full) else "missing").encode())
+    return h.hexdigest()
+
+
+# =========================
+# DAG
+# =========================
+
+def producers():
+    """output file -> producing stage."""
+    owner = {}
+    for name, stage in STAGES.items():
+        for path in stage["outputs"]:
+            if path in owner:
+                raise ValueError(f"{path} is produced by both {owner[path]} and {name}")
+            owner[path] = name
+    return owner
+
+
+def dependencies():
+    """stage -> set of stages whose outputs it reads."""
+    owner = producers()
+    return {name: {owner[p] for p in stage["inputs"] if p in owner}
+            for name, stage in STAGES.items()}
+
+
+def closure(targets):
+    """targets plus all their upstream stages, in topological order."""
+    deps = dependencies()
+    order, state = [], {}
+
+    def visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "active":
+            raise ValueError(f"dependency cycle through {name}")
+        state[name] = "active"
+        for dep in sorted(deps[name]):
+            visit(dep)
+        state[name] = "done"
+        order.append(name)
+
+    for name in targets:
+        if name not in STAGES:
+            raise KeyError(f"unknown stage {name!r}; have {sorted(STAGES)}")
+        visit(name)
+    return order
+
+
+# =========================
+# Runner
+# =========================
+
+def load_manifest(workdir="."):
+    path = os.path.join(workdir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, workdir="."):
+    """Write the manifest atomically so an interrupted run never corrupts it."""
+    path = os.path.join(workdir, MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def is_stale(name, manifest, workdir="."):
+    stage = STAGES[name]
+    if any(not os.path.exists(os.path.join(workdir, p)) for p in stage["outputs"]):
+        return True
+    return manifest.get(name, {}).get("key") != stage_key(name, workdir)
+
+
+def _run_stage(name, workdir):
+    stage = STAGES[name]
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, stage["script"])] + stage["args"],
+                          cwd=workdir, capture_output=True, text=True)
+    return proc, time.perf_counter() - start
+
+
+def run(targets=None, jobs=None, workdir=".", force=False, dry_run=False, verbose=True):
+    """Bring targets (default: all stages) up to date; returns {stage: status}.
+
+    Status is "cached", "ran", "failed", "skipped" (an upstream stage
+    failed) or "stale" (dry run). Staleness is decided when a stage becomes
+    ready, after its upstream stages have rewritten their outputs.
+    """
+    order = closure(sorted(STAGES) if targets is None else targets)
+    deps = dependencies()
+    manifest = load_manifest(workdir)
+    status = {}
+
+    if dry_run:
+        for name in order:
+            upstream_stale = any(status[d] == "stale" for d in deps[name])
+            missing = any(not os.path.exists(os.path.join(workdir, p)) for p in STAGES[name]["inputs"])
+            stale = force or upstream_stale or missing or is_stale(name, manifest, workdir)
+            status[name] = "stale" if stale else "cached"
+        return status
+
+    pending = list(order)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        while pending or running:
+            for name in list(pending):
+                if any(d not in status for d in deps[name]):
+                    continue
+                pending.remove(name)
+                if any(status[d] in ("failed", "skipped") for d in deps[name]):
+                    status[name] = "skipped"
+                elif not force and not is_stale(name, manifest, workdir):
+                    status[name] = "cached"
+                else:
+                    running[pool.submit(_run_stage, name, workdir)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                proc, elapsed = future.result()
+                if proc.returncode == 0:
+                    status[name] = "ran"
+                    manifest[name] = {"key": stage_key(name, workdir), "seconds": round(elapsed, 3)}
+                    save_manifest(manifest, workdir)
+                else:
+                    status[name] = "failed"
+                    manifest.pop(name, None)
+                    save_manifest(manifest, workdir)
+                    if verbose:
+                        print(proc.stderr, file=sys.stderr)
+                if verbose:
+                    print(f"{status[name]:>7}  {name}  ({elapsed:.1f} s)")
+    if verbose:
+        cached = [name for name in order if status[name] == "cached"]
+        if cached:
+            print(f" cached  {', '.join(cached)}")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the figure pipeline incrementally")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="maximum number of stages run at once (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rerun even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="report stale stages only")
+    parser.add_argument("--list", action="store_true", help="list stages and their inputs")
+    args = parser.parse_args()
+
+    if args.list:
+        deps = dependencies()
+        for name in closure(sorted(STAGES)):
+            after = f"  <- {', '.join(sorted(deps[name]))}" if deps[name] else ""
+            print(f"{name:22s} {STAGES[name]['script']}{after}")
+        return
+    status = run(args.targets or None, args.jobs, force=args.force, dry_run=args.dry_run,
+                 verbose=not args.dry_run)
+    if args.dry_run:
+        for name, state in status.items():
+            print(f"{state:>7}  {name}")
+    sys.exit(1 if "failed" in status.values() else 0)
+
+
+if __name__ == "__main__":
+    main()
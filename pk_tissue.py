@@ -0,0 +1,140 @@
+"""Coupled propranolol PK -> PD -> tissue simulation.
+
+Plasma concentration follows the closed-form one-compartment model of
+figure5_propranolol.py, with repeated doses added by superposition. It is
+evaluated once on the tissue time grid, mapped to an Emax blockade E(t),
+and E(t) sets the time-varying k3 of the whole grid or of a masked region:
+
+    k3_cell(t) = k3_baseline * (1 - E(t) * mask)
+"""
+import numpy as np
+from scipy.integrate import cumulative_trapezoid
+from scipy.special import exprel
+
+from dose_response import DRUGS, hill_inhibition
+from gap_junction_tissue import simulate_coupled_tissue
+
+# Illustrative patient from figure5_propranolol.py / the parameter table
+PK_DEFAULTS = {"F": 0.26, "Vd": 5.11 * 70, "ke": 0.231}
+
+
+def dosing_schedule(dose, interval, n_doses, start=0.0):
+    """Dose times (h) and amounts (ug) for n_doses equal doses every interval hours."""
+    times = start + interval * np.arange(n_doses)
+    return times, np.full(n_doses, float(dose))
+
+
+def plasma_concentration(t, dose_times, doses, F=0.26, Vd=5.11 * 70, ke=0.231):
+    """C(t) = sum_i F*D_i/Vd * exp(-ke*(t - t_i)) over doses with t_i <= t (ug/L).
+
+    Closed form of dC/dt = -ke*C with bolus jumps; each dose adds its decaying
+    tail, so multi-day regimens cost one pass per dose over the time grid.
+    F, Vd and ke may be arrays broadcasting against t (e.g. (n, 1) for n
+    parameter sets); C then has the broadcast shape.
+    """
+    t = np.asarray(t, dtype=float)
+    C = np.zeros(np.broadcast_shapes(t.shape, np.shape(F), np.shape(Vd), np.shape(ke)))
+    for t_i, dose in zip(np.atleast_1d(dose_times), np.atleast_1d(doses)):
+        after = t >= t_i
+        C += np.where(after, F * dose / Vd * np.exp(-ke * np.where(after, t - t_i, 0.0)), 0.0)
+    return C
+
+
+def emax_blockade(C, ic50=None, hill_n=None):
+    """Fractional channel blockade E = C^n / (IC50^n + C^n) (propranolol defaults)."""
+    spec = DRUGS["propranolol"]
+    return hill_inhibition(C, spec["ic50"] if ic50 is None else ic50,
+                           spec["hill_n"] if hill_n is None else hill_n)
+
+
+def _uncoupled_final_states(t, E, k1, k2, k3_baseline, weights, y0):
+    """Final (X, V) per unique (mask weight, k3) cell; k3 integral by trapezoid on t.
+
+    E is the blockade on t, shared (T,) or one row per cell (n_unique, T).
+    """
+    k3_t = k3_baseline[:, None] * (1.0 - weights[:, None] * E)  # (n_unique, T)
+    decay = cumulative_trapezoid(k3_t, t, axis=-1, initial=0.0)
+    V = y0[1] * np.exp(-decay)
+    S = cumulative_trapezoid(V, t, axis=-1, initial=0.0)[:, -1]
+    X = y0[0] + (k1 - k2 * y0[0]) * S * exprel(-k2 * S)
+    return X, V[:, -1]
+
+
+def pk_driven_tissue(t, dose_times, doses, shape=(10, 10), mask=None, k1=1.0, k2=0.1,
+                     k3_baseline=0.01, y0=(1.0, 1.0), coupling=0.1, hours_per_unit=1.0,
+                     ic50=None, hill_n=None, pk=None, **tissue_kwargs):
+    """Tissue under a propranolol regimen; returns (X, V, C, E).
+
+    t is the tissue time grid and dose_times are in hours; tissue time t is
+    t * hours_per_unit hours on the dosing clock. mask (bool or per-cell weight)
+    limits the blockade to a region; None applies it to the whole grid. C and
+    E are the plasma concentration and blockade on the grid. With
+    coupling=0 the cells are independent and every unique (mask weight, k3,
+    k1, k2) cell is solved once; otherwise the gap-junction engine runs with the
+    precomputed E(t) (extra keyword arguments go to simulate_coupled_tissue).
+    """
+    t = np.asarray(t, dtype=float)
+    pk = dict(PK_DEFAULTS, **(pk or {}))
+    C = plasma_concentration(t * hours_per_unit, dose_times, doses, **pk)
+    E = emax_blockade(C, ic50, hill_n)
+    region = np.ones(shape) if mask is None else np.broadcast_to(np.asarray(mask, dtype=float), shape)
+
+    if coupling == 0:
+        cells = np.stack([np.broadcast_to(np.asarray(a, dtype=float), shape).ravel()
+                          for a in (region, k3_baseline, k1, k2)], axis=1)
+        uniq, inverse = np.unique(cells, axis=0, return_inverse=True)
+        X, V = _uncoupled_final_states(t, E, uniq[:, 2], uniq[:, 3], uniq[:, 1], uniq[:, 0], y0)
+        inverse = inverse.reshape(shape)
+        return X[inverse], V[inverse], C, E
+
+    X, V = simulate_coupled_tissue(k1, k2, k3_baseline, shape, t, y0=y0, coupling=coupling,
+                                   inhibition=E, region=region, **tissue_kwargs)
+    return X, V, C, E
+
+
+
+# (name, tolerance): max |uncoupled - reference| / max(1, max |reference|) over X and V
+UNCOUPLED_CHECKS = {
+    "closed_form": 1e-6,    # no dose: constant k3, analytic_state per cell
+    "coupled_bdf": 1e-4,    # 4-dose regimen, left-half mask, per-cell k1
+    "coupled_euler": 1e-3,  # same; explicit Euler is first order in dt
+}
+
+
+def validate_uncoupled(n_points=2000, checks=UNCOUPLED_CHECKS):
+    """Check the coupling=0 fast path of pk_driven_tissue; returns {name: error}.
+
+    It is compared with the closed form (no dose, so k3 is constant) and with
+    simulate_coupled_tissue(..., coupling=0), both BDF and Euler, under a
+    12-hourly regimen superposed by dosing_schedule.
+    """
+    from bioelectric_solver import analytic_state
+    from tissue_sim import half_mask
+
+    shape = (10, 10)
+    t = np.linspace(0, 48, n_points)
+    k1 = np.linspace(0.5, 1.5, shape[0] * shape[1]).reshape(shape)
+    mask = half_mask(*shape)
+    times, doses = dosing_schedule(80e3, 12, 4)
+    X, V, _, E = pk_driven_tissue(t, times, doses, shape, mask, k1=k1, coupling=0)
+    X0, V0, _, _ = pk_driven_tissue(t, [], [], shape, mask, k1=k1, coupling=0)
+
+    references = {"closed_form": ((X0, V0), analytic_state(t[-1], k1, 0.1, 0.01))}
+    for method in ("bdf", "euler"):
+        references[f"coupled_{method}"] = ((X, V), simulate_coupled_tissue(
+            k1, 0.1, 0.01, shape, t, coupling=0, inhibition=E, region=mask, method=method))
+    errors = {}
+    for name, ((Xu, Vu), (Xr, Vr)) in references.items():
+        errors[name] = max(np.abs(Xu - Xr).max() / max(1.0, np.abs(Xr).max()),
+                           np.abs(Vu - Vr).max() / max(1.0, np.abs(Vr).max()))
+        if errors[name] > checks[name]:
+            raise AssertionError(f"uncoupled PK tissue disagrees with {name}: "
+                                 f"error {errors[name]:.2e} > {checks[name]:.0e}")
+    return errors
+
+
+if __name__ == "__main__":
+    errs = validate_uncoupled()
+    for name, err in errs.items():
+        print(f"{name}: max rel error {err:.2e} (tolerance {UNCOUPLED_CHECKS[name]:.0e})")
+    print(f"✅ Uncoupled PK tissue matches {len(errs)} references")
@@ -0,0 +1,30 @@
+"""Lazily imported matplotlib renderer for the figure scripts.
+
+Simulation modules never import matplotlib; figure scripts call pyplot()
+inside their main() so imports stay cheap for workers and batch jobs.
+The Agg backend is selected unless MPLBACKEND asks for another one.
+"""
+import os
+
+_pyplot = None
+
+
+def pyplot():
+    """matplotlib.pyplot, imported on first use with the Agg backend by default."""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        if not os.environ.get("MPLBACKEND"):
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _pyplot = plt
+    return _pyplot
+
+
+def save_figure(path, fig=None, **kwargs):
+    """savefig at 300 dpi (the figure scripts' default) and release the figure."""
+    plt = pyplot()
+    fig = plt.gcf() if fig is None else fig
+    kwargs.setdefault("dpi", 300)
+    fig.savefig(path, **kwargs)
+    plt.close(fig)
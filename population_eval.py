@@ -0,0 +1,232 @@
+"""Population-level fitness evaluation for the DEAP tissue experiments.
+
+A whole (pop_size, 3) matrix of [k1, k2, k3] genomes is simulated on every
+cell at once and all fitnesses are returned together. BatchedMap plugs this
+into a toolbox so eaSimple / hand-rolled loops evaluate a population in one call.
+BoundedMap does the same with early abort: cells are simulated group by
+group and an individual is dropped once its partial MSE passes a cutoff.
+A PopulationWorkspace keeps the (pop_size, cells) pattern matrix in a
+reused buffer of a chosen precision (e.g. float32) across generations.
+"""
+import numpy as np
+import instrumentation
+from bioelectric_solver import bioelectric_model, batched_final_state
+from tissue_sim import half_mask, k3_scale_from_mask, unique_final_states
+
+
+def ivermectin_k3_scale(N, factor=2.0, k3_baseline=0.01):
+    """Per-cell k3 multiplier for the stage 2/3 tissue: left half gets factor x."""
+    return k3_scale_from_mask(half_mask(N), factor, k3_baseline)
+
+
+def population_patterns(params, k3_scale, t, y0=(1, 1), model=bioelectric_model, out=None):
+    """Final Vnorm of every individual x cell, shape (pop_size,) + k3_scale.shape.
+
+    Cell (i, j) of individual p runs with (k1, k2, k3 * k3_scale[i, j]).
+    Identical cells (within and across individuals) are solved only once.
+    With out (a contiguous array of that shape, any float dtype) the
+    patterns are scattered into it in its precision and out is returned.
+    """
+    params = np.asarray(params, dtype=float).reshape(-1, 3)
+    k3_scale = np.asarray(k3_scale, dtype=float)
+    # Deduplicate the k3 map once, then solve (individual, distinct scale) pairs only
+    scales, cell_scale = np.unique(k3_scale.ravel(), return_inverse=True)
+    k1, k2, k3 = (params[:, i][:, None] for i in range(3))
+    states = unique_final_states(k1, k2, k3 * scales, y0[0], y0[1], t, model)
+    if out is None:
+        return states[:, cell_scale.ravel(), 1].reshape((len(params),) + k3_scale.shape)
+    V = states[..., 1].astype(out.dtype)  # (pop_size, distinct scales): cast before the scatter
+    np.take(V, cell_scale.ravel(), axis=1, out=out.reshape(len(params), -1), mode="clip")
+    return out
+
+
+class PopulationWorkspace:
+    """Reusable pattern buffer for evaluate_population in one precision.
+
+    The (pop_size, cells) matrix is allocated once and only regrown when a
+    larger population arrives; the target is cast to dtype once per target
+    object. Squared errors are formed in place and averaged in float64.
+    """
+
+    def __init__(self, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self._buffer = np.empty(0, self.dtype)
+        self._target = (None, None)
+
+    def patterns(self, shape):
+        """A view of the buffer with this shape (contents undefined)."""
+        size = int(np.prod(shape))
+        if self._buffer.size < size:
+            self._buffer = np.empty(size, self.dtype)
+        return self._buffer[:size].reshape(shape)
+
+    def target(self, target):
+        if self._target[0] is not target:
+            self._target = (target, np.asarray(target, dtype=self.dtype))
+        return self._target[1]
+
+    def __reduce__(self):  # shipped to pool workers as that process's own workspace
+        return process_workspace, (self.dtype,)
+
+
+# dtype -> PopulationWorkspace of this process
+_process_workspaces = {}
+
+
+def process_workspace(dtype=np.float32):
+    """The PopulationWorkspace of this process for dtype.
+
+    Pickled workspaces unpickle to it, so each pool worker keeps one set of
+    buffers for all the chunks it evaluates instead of reallocating per chunk.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in _process_workspaces:
+        _process_workspaces[dtype] = PopulationWorkspace(dtype)
+    return _process_workspaces[dtype]
+
+
+def evaluate_population(params, target, k3_scale, t, y0=(1, 1), model=bioelectric_model,
+                        workspace=None):
+    """MSE between each individual's pattern and target, shape (pop_size,).
+
+    With a PopulationWorkspace the patterns and errors are computed in its
+    buffer and precision instead of fresh float64 arrays.
+    """
+    if workspace is None:
+        patterns = population_patterns(params, k3_scale, t, y0, model)
+        err = (patterns - np.asarray(target, dtype=float)) ** 2
+        return err.reshape(len(err), -1).mean(axis=1)
+    params = np.asarray(params, dtype=float).reshape(-1, 3)
+    err = workspace.patterns((len(params),) + np.shape(k3_scale))
+    population_patterns(params, k3_scale, t, y0, model, out=err)
+    err -= workspace.target(target)
+    np.square(err, out=err)
+    return err.reshape(len(err), -1).mean(axis=1, dtype=np.float64)
+
+
+class BatchedMap:
+    """toolbox.map replacement that evaluates a whole population in one call.
+
+    batch_evaluate takes a (n, 3) genome matrix and returns n fitness values,
+    or an (n, n_objectives) matrix for multi-objective fitnesses.
+    With an executor (e.g. a ProcessPoolExecutor) the matrix is split into
+    n_chunks row blocks evaluated concurrently; batch_evaluate must then be
+    picklable. Calls with any function other than evaluate fall back to map.
+    """
+
+    def __init__(self, batch_evaluate, evaluate, executor=None, n_chunks=None):
+        self.batch_evaluate = batch_evaluate
+        self.evaluate = evaluate
+        self.executor = executor
+        self.n_chunks = n_chunks
+
+    def __call__(self, func, *iterables):
+        if func is not self.evaluate or len(iterables) != 1:
+            return list(map(func, *iterables))
+        individuals = list(iterables[0])
+        if not individuals:
+            return []
+        params = np.asarray(individuals, dtype=float)
+        if self.executor is None:
+            fits = self.batch_evaluate(params)
+        else:
+            n_chunks = min(len(params), self.n_chunks or 1)
+            chunks = np.array_split(params, n_chunks)
+            fits = np.concatenate(list(self.executor.map(self.batch_evaluate, chunks)))
+        fits = np.asarray(fits, dtype=float)
+        if fits.ndim == 2:  # multi-objective: one row of objectives per individual
+            return [tuple(row) for row in fits.tolist()]
+        return [(float(f),) for f in fits]
+
+
+def register_batched_map(toolbox, batch_evaluate, executor=None, n_chunks=None):
+    """Register a BatchedMap for the toolbox's current evaluate function."""
+    toolbox.register("map", BatchedMap(batch_evaluate, toolbox.evaluate, executor, n_chunks))
+
+
+# =========================
+# Early-abort evaluation
+# =========================
+
+class BoundedFitness(tuple):
+    """Fitness tuple holding a lower bound on the MSE rather than its exact value.
+
+    Returned for individuals whose evaluation stopped early; FitnessCache
+    does not store these.
+    """
+    bounded = True
+
+
+def bounded_population_mse(params, target, k3_scale, t, y0=(1, 1), cutoff=np.inf,
+                           model=bioelectric_model, groups_per_step=1):
+    """MSE per individual with early abort; returns (mse, exact), both shape (pop_size,).
+
+    Cells sharing a k3_scale value form one parameter group per individual.
+    Groups are simulated largest first, groups_per_step at a time, for the
+    individuals still running. The squared errors accumulated so far, divided
+    by the total cell count, are a lower bound on the MSE. An individual
+    stops as soon as that bound exceeds its cutoff (scalar or per individual).
+    For stopped individuals mse holds the bound and exact is False.
+    """
+    params = np.asarray(params, dtype=float).reshape(-1, 3)
+    n_pop = len(params)
+    scale = np.asarray(k3_scale, dtype=float).ravel()
+    target = np.broadcast_to(np.asarray(target, dtype=float), np.shape(k3_scale)).ravel()
+    cutoff = np.broadcast_to(np.asarray(cutoff, dtype=float), (n_pop,))
+
+    values, inverse, counts = np.unique(scale, return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    by_group = np.split(np.argsort(inverse, kind="stable"), np.cumsum(counts)[:-1])
+    cells = [by_group[g] for g in order]
+
+    sse = np.zeros(n_pop)
+    running = np.ones(n_pop, dtype=bool)
+    for start in range(0, len(order), groups_per_step):
+        idx = np.flatnonzero(running)
+        if idx.size == 0:
+            break
+        k1, k2, k3 = (params[idx, i][:, None] for i in range(3))
+        step = order[start:start + groups_per_step]
+        V = batched_final_state(model, y0, t, args=(k1, k2, k3 * values[step]))[..., 1]
+        for j, g in enumerate(range(start, start + len(step))):
+            sse[idx] += ((V[:, j:j + 1] - target[cells[g]]) ** 2).sum(axis=1)
+        instrumentation.count("bounded.group_solves", idx.size * len(step))
+        running[idx] = sse[idx] / scale.size <= cutoff[idx]
+
+    exact = running.copy()
+    instrumentation.count("bounded.aborted", n_pop - exact.sum())
+    return sse / scale.size, exact
+
+
+class BoundedMap:
+    """toolbox.map replacement using bounded_population_mse with a moving cutoff.
+
+    cutoff is a number or a zero-argument callable read at every population
+    evaluation (e.g. the worst hall-of-fame fitness); individuals proven worse
+    than it get a BoundedFitness. Calls with any function other than evaluate
+    fall back to map.
+    """
+
+    def __init__(self, evaluate, target, k3_scale, t, y0=(1, 1), cutoff=np.inf,
+                 model=bioelectric_model, groups_per_step=1):
+        self.evaluate = evaluate
+        self.problem = dict(target=target, k3_scale=k3_scale, t=t, y0=y0, model=model,
+                            groups_per_step=groups_per_step)
+        self.cutoff = cutoff
+
+    def __call__(self, func, *iterables):
+        if func is not self.evaluate or len(iterables) != 1:
+            return list(map(func, *iterables))
+        individuals = list(iterables[0])
+        if not individuals:
+            return []
+        cutoff = self.cutoff() if callable(self.cutoff) else self.cutoff
+        mse, exact = bounded_population_mse(np.asarray(individuals, dtype=float),
+                                            cutoff=cutoff, **self.problem)
+        return [(float(m),) if ok else BoundedFitness((float(m),)) for m, ok in zip(mse, exact)]
+
+
+def register_bounded_map(toolbox, target, k3_scale, t, y0=(1, 1), cutoff=np.inf, **kwargs):
+    """Register a BoundedMap for the toolbox's current evaluate function."""
+    toolbox.register("map", BoundedMap(toolbox.evaluate, target, k3_scale, t, y0, cutoff,
+                                       **kwargs))
@@ -0,0 +1,107 @@
+"""Float32 compact-state mode: accuracy against float64 and memory footprint.
+
+The Euler tissue engine (gap_junction_tissue: dtype / TissueBuffers) and the
+batched population evaluator (population_eval.PopulationWorkspace) can keep
+their state in float32. PRECISION_CASES reruns representative workloads in
+both precisions. validate_against_float64 raises when a reduced-precision
+result drifts from float64 by more than rtol, with errors scaled by
+max(1, max |float64|) as in bioelectric_solver.validate_against_odeint:
+
+    python precision.py
+"""
+import numpy as np
+
+from gap_junction_tissue import (TissueBuffers, coupled_steady_state, linear_operator,
+                                 simulate_coupled_tissue)
+from population_eval import PopulationWorkspace, evaluate_population, ivermectin_k3_scale
+from tissue_sim import half_mask, simulate_tissue
+
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+
+def _figure4_tissue(dtype):
+    """figure4_tissue.py: 10 x 10 grid, 500 Euler steps, left half amiloride."""
+    shape = (10, 10)
+    k3 = np.where(half_mask(*shape), 0.001, 0.01)
+    return simulate_coupled_tissue(1, 0.1, k3, shape, np.linspace(0, 50, 500), coupling=0.1,
+                                   dtype=dtype)[1]
+
+
+def _large_tissue(dtype):
+    """200 x 200 periodic 8-neighbour grid, random k3, time-varying block, 1000 steps."""
+    shape = (200, 200)
+    t = np.linspace(0, 100, 1000)
+    k3 = np.random.default_rng(0).uniform(0.001, 0.05, shape)
+    return simulate_coupled_tissue(1, 0.1, k3, shape, t, coupling=0.2, neighbors=8,
+                                   boundary="periodic", inhibition=np.linspace(0, 0.9, len(t)),
+                                   region=half_mask(*shape), dtype=dtype)[1]
+
+
+def _steady_state(dtype):
+    """50 x 50 left-half amiloride tissue run to max |dV/dt| < 1e-4."""
+    shape = (50, 50)
+    k3 = np.where(half_mask(*shape), 0.001, 0.01)
+    return coupled_steady_state(1, 0.1, k3, shape, tol=1e-4, dtype=dtype)[1]
+
+
+def _degenerate_grids(dtype):
+    """Uncoupled 3 x 4 grid, a single cell and a 1 x 5 strip (no main diagonal in L)."""
+    t = np.linspace(0, 50, 500)
+    return np.concatenate([
+        simulate_coupled_tissue(1, 0.1, 0.01, (3, 4), t, coupling=0.0, dtype=dtype)[1].ravel(),
+        simulate_coupled_tissue(1, 0.1, 0.01, (1, 1), t, coupling=0.1, dtype=dtype)[1].ravel(),
+        simulate_coupled_tissue(1, 0.1, 0.01, (1, 5), t, coupling=0.0, dtype=dtype)[1].ravel(),
+    ])
+
+
+def _stage3_population(dtype):
+    """Batched stage-3 MSEs of 200 random genomes (bounds 0.5-2)."""
+    t = np.linspace(0, 100, 2000)
+    target = simulate_tissue([1.0, 1.0, 1.0], np.ones((10, 10)), t, (1, 1))
+    genomes = np.random.default_rng(0).uniform(0.5, 2.0, (200, 3))
+    workspace = None if np.dtype(dtype) == np.float64 else PopulationWorkspace(dtype)
+    return evaluate_population(genomes, target, ivermectin_k3_scale(10), t, workspace=workspace)
+
+
+# name -> workload(dtype) returning an array
+PRECISION_CASES = {
+    "figure4_tissue": _figure4_tissue,
+    "large_tissue": _large_tissue,
+    "steady_state": _steady_state,
+    "degenerate_grids": _degenerate_grids,
+    "stage3_population": _stage3_population,
+}
+
+
+def validate_against_float64(cases=None, dtype=np.float32, rtol=1e-4):
+    """Run each case in dtype and in float64; returns {name: scaled max error}."""
+    errors = {}
+    for name in cases or PRECISION_CASES:
+        workload = PRECISION_CASES[name]
+        reference = workload(np.float64)
+        result = np.asarray(workload(dtype), dtype=float)
+        err = np.abs(result - reference).max() / max(1.0, np.abs(reference).max())
+        errors[name] = err
+        if err > rtol:
+            raise AssertionError(f"{np.dtype(dtype).name} disagrees with float64 on {name}: "
+                                 f"error {err:.2e} > {rtol:.0e}")
+    return errors
+
+
+def tissue_nbytes(shape, dtype=np.float64, neighbors=4, boundary="neumann"):
+    """Bytes of an Euler run's state: TissueBuffers plus the sparse operator A."""
+    A = linear_operator(0.01, shape, neighbors=neighbors, boundary=boundary, dtype=dtype)
+    index = (A.offsets,) if A.format == "dia" else (A.indices, A.indptr)
+    buffers = TissueBuffers(shape[0] * shape[1], dtype)
+    return buffers.nbytes + sum(a.nbytes for a in (A.data,) + index)
+
+
+if __name__ == "__main__":
+    errs = validate_against_float64()
+    for name, err in errs.items():
+        print(f"{name}: float32 max rel error {err:.2e}")
+    shape = (1000, 1000)
+    sizes = {name: tissue_nbytes(shape, dtype) for name, dtype in PRECISIONS.items()}
+    print(f"{shape[0]}x{shape[1]} tissue state: "
+          + ", ".join(f"{name} {size / 2 ** 20:.1f} MiB" for name, size in sizes.items()))
+    print(f"✅ float32 matches float64 on {len(errs)} cases")
@@ -0,0 +1,350 @@
+"""Global sensitivity analysis (Sobol and Morris) over model and drug parameters.
+
+Parameter ranges follow Blockmodule-Parametersymbol-Valuerange-Units-Notes.csv.
+The rate constants span the stage-3 bounds of 0.5-2x baseline, f_ivm brackets
+the 2x ivermectin factor, and IC50, Hill and the PK constants span their
+figure-5 values. A model maps a block of samples (one column per parameter)
+to one or more scalar outputs in one vectorized call. Parameters that are not
+sampled stay at their nominal value. The sample matrix is evaluated in
+chunks, optionally across a process pool:
+
+    result = sobol_analysis("ivermectin_tissue", n=2**14, workers=8)
+    python sensitivity.py sobol ivermectin_tissue -n 16384 --workers 8
+
+Sobol indices use a Saltelli design on a scrambled Sobol' sequence, which
+takes n * (d + 2) model runs. The first-order index uses the Saltelli (2010)
+estimator and the total index the Jansen estimator. Morris screening runs r
+one-at-a-time trajectories on a p-level grid, d + 1 runs each. Confidence
+intervals are bootstrap percentiles over the base rows or the trajectories.
+"""
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+from scipy.stats import qmc
+
+from bioelectric_solver import bioelectric_model, batched_final_state
+from dose_response import DRUGS
+from pk_tissue import PK_DEFAULTS, _uncoupled_final_states, emax_blockade, plasma_concentration
+from tissue_sim import half_mask
+
+
+def _around(nominal, low=0.5, high=2.0, log=False):
+    return {"range": (nominal * low, nominal * high), "nominal": nominal, "log": log}
+
+
+# name -> {"range": (low, high), "nominal": value, "log": sample log-uniformly}
+PARAMETERS = {
+    "k1": _around(1.0),  # x model baseline, stage-3 bounds
+    "k2": _around(1.0),
+    "k3": _around(1.0),
+    "f_ivm": {"range": (1.0, 3.0), "nominal": 2.0, "log": False},  # left-half k3 factor
+    "ic50": _around(DRUGS["propranolol"]["ic50"], 1 / 3, 3.0, log=True),  # ug/L
+    "hill_n": {"range": (1.0, 2.0), "nominal": DRUGS["propranolol"]["hill_n"], "log": False},
+    "ke": _around(PK_DEFAULTS["ke"]),  # 1/h
+    "F": _around(PK_DEFAULTS["F"]),
+    "Vd": _around(PK_DEFAULTS["Vd"]),  # L
+}
+
+# name -> (func(columns) -> (n, n_outputs), parameter names, output names)
+MODELS = {}
+
+
+def register_model(name, parameters, outputs):
+    """Register func(columns) where columns maps each parameter name to an (n,) array."""
+    def decorator(func):
+        MODELS[name] = (func, tuple(parameters), tuple(outputs))
+        return func
+    return decorator
+
+
+# =========================
+# Models
+# =========================
+
+SINGLE_CELL_BASELINE = (1.0, 0.1, 0.01)  # (k1, k2, k3) of figure2_sweep.py
+T_END = 100.0  # single-cell / tissue time window
+PK_DOSE = 80_000.0  # ug, one dose at t = 0
+PK_TIME = np.linspace(0, 24, 100)  # h
+
+
+@register_model("single_cell", ["k1", "k2", "k3"], ["X_final", "V_final"])
+def _single_cell(p):
+    """Closed-form final state of one cell; k1-k3 scale the figure-2 baseline."""
+    k1, k2, k3 = (p[k] * base for k, base in zip(("k1", "k2", "k3"), SINGLE_CELL_BASELINE))
+    return batched_final_state(bioelectric_model, (1, 1), [0.0, T_END], args=(k1, k2, k3))
+
+
+@register_model("ivermectin_tissue", ["k1", "k2", "k3", "f_ivm"], ["mean_V", "contrast"])
+def _ivermectin_tissue(p, N=10):
+    """Stage-3 genome on the 10x10 tissue with f_ivm on the left half.
+
+    Outputs the mean final Vnorm and the left-minus-right contrast. As in
+    population_patterns, only the distinct cells of the k3 map are solved.
+    """
+    mask = half_mask(N)
+    classes, cell_class = np.unique(mask, return_inverse=True)
+    k3_scale = np.where(classes, 0.01 * p["f_ivm"][:, None], 0.01)  # (n, n_classes)
+    states = batched_final_state(bioelectric_model, (1, 1), [0.0, T_END],
+                                 args=(p["k1"][:, None], p["k2"][:, None], p["k3"][:, None] * k3_scale))
+    V = states[:, cell_class.ravel(), 1]
+    left = mask.ravel()
+    return np.stack([V.mean(axis=1), V[:, left].mean(axis=1) - V[:, ~left].mean(axis=1)], axis=1)
+
+
+@register_model("propranolol_pk", ["k3", "ic50", "hill_n", "ke", "F", "Vd"],
+                ["V_final", "mean_blockade"])
+def _propranolol_pk(p):
+    """One cell under a single 80 mg propranolol dose over 24 h (pk_tissue with coupling=0)."""
+    C = plasma_concentration(PK_TIME, [0.0], [PK_DOSE], F=p["F"][:, None], Vd=p["Vd"][:, None],
+                             ke=p["ke"][:, None])
+    E = emax_blockade(C, p["ic50"][:, None], p["hill_n"][:, None])
+    k1, k2, k3 = SINGLE_CELL_BASELINE
+    _, V = _uncoupled_final_states(PK_TIME, E, k1, k2, k3 * p["k3"], np.ones(len(E)), (1.0, 1.0))
+    return np.stack([V, E.mean(axis=1)], axis=1)
+
+
+# =========================
+# Sampling and evaluation
+# =========================
+
+def scale_samples(U, names):
+    """Map unit-cube samples onto the PARAMETERS ranges (log-uniform where flagged)."""
+    X = np.empty_like(U)
+    for i, name in enumerate(names):
+        spec = PARAMETERS[name]
+        lo, hi = np.log(spec["range"]) if spec["log"] else spec["range"]
+        X[:, i] = lo + U[:, i] * (hi - lo)
+        if spec["log"]:
+            X[:, i] = np.exp(X[:, i])
+    return X
+
+
+def saltelli_samples(n, d, seed=None):
+    """Unit-cube rows [A; B; AB_1; ...; AB_d], shape (n * (d + 2), d).
+
+    A and B are the two halves of an n-point scrambled Sobol' sequence in 2d
+    dimensions (n should be a power of two); AB_i is A with column i from B.
+    """
+    base = qmc.Sobol(2 * d, scramble=True, seed=seed).random(n)
+    A, B = base[:, :d], base[:, d:]
+    AB = np.repeat(A[None], d, axis=0)
+    i = np.arange(d)
+    AB[i, :, i] = B[:, i].T
+    return np.concatenate([A, B, AB.reshape(-1, d)])
+
+
+def morris_samples(r, d, levels=4, seed=None):
+    """r one-at-a-time trajectories on a levels-point grid, shape (r * (d + 1), d).
+
+    Each trajectory moves every coordinate once, in random order, by
+    +-levels / (2 * (levels - 1)).
+    """
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+    grid = np.arange(levels) / (levels - 1)
+    signs = rng.choice([-1.0, 1.0], size=(r, d))
+    start = rng.choice(grid[grid <= 1 - delta + 1e-12], size=(r, d)) + delta * (signs < 0)
+    order = rng.permuted(np.tile(np.arange(d), (r, 1)), axis=1)
+    rows = np.arange(r)[:, None]
+    steps = np.zeros((r, d + 1, d))
+    steps[rows, np.arange(1, d + 1), order] = signs[rows, order] * delta
+    return (start[:, None, :] + np.cumsum(steps, axis=1)).reshape(-1, d)
+
+
+def _evaluate_chunk(model, names, X):
+    func, parameters, _ = MODELS[model]
+    columns = {k: np.full(len(X), float(PARAMETERS[k]["nominal"])) for k in parameters}
+    columns.update((k, X[:, i]) for i, k in enumerate(names))
+    return np.asarray(func(columns), dtype=float).reshape(len(X), -1)
+
+
+def evaluate_samples(model, X, names=None, chunk_size=10_000, workers=None, executor=None):
+    """Outputs of model for the physical sample matrix X (one column per name), (n, n_outputs).
+
+    Rows are evaluated chunk_size at a time. With workers > 1, or an
+    executor, the chunks run concurrently in worker processes.
+    """
+    names = tuple(names or MODELS[model][1])
+    if executor is None and workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return evaluate_samples(model, X, names, chunk_size, executor=pool)
+    chunks = np.array_split(X, max(1, -(-len(X) // chunk_size)))
+    if executor is None:
+        parts = [_evaluate_chunk(model, names, chunk) for chunk in chunks]
+    else:
+        parts = list(executor.map(_evaluate_chunk, repeat(model), repeat(names), chunks))
+    return np.concatenate(parts)
+
+
+# =========================
+# Estimators
+# =========================
+
+def _bootstrap_means(terms, n_boot, seed=None, max_bytes=2 ** 25):
+    """Means of the rows of terms under n_boot resamples with replacement, (n_boot, m).
+
+    A resample is a row-count vector, so each batch of resamples is a single
+    (batch, n) @ (n, m) product; batches are sized to keep counts under max_bytes.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(terms)
+    batch = max(1, min(n_boot, max_bytes // (8 * n)))
+    means = []
+    for start in range(0, n_boot, batch):
+        counts = np.stack([np.bincount(rng.integers(0, n, n), minlength=n)
+                           for _ in range(min(batch, n_boot - start))]).astype(float)
+        means.append(counts @ terms / n)
+    return np.concatenate(means)
+
+
+def _interval(samples, confidence):
+    tail = 50 * (1 - confidence)
+    return np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+
+
+def _sobol_terms(fA, fB, fAB):
+    """Per-row terms whose column means give the Sobol estimators."""
+    n = len(fA)
+    return np.concatenate([(fB * (fAB - fA)).transpose(1, 0, 2).reshape(n, -1),
+                           (0.5 * (fA - fAB) ** 2).transpose(1, 0, 2).reshape(n, -1),
+                           0.5 * (fA + fB), 0.5 * (fA ** 2 + fB ** 2)], axis=1)
+
+
+def _sobol_indices(means, d):
+    """(S1, ST), each means.shape[:-1] + (d, n_outputs), from the means of _sobol_terms."""
+    k = means.shape[-1] // (2 * d + 2)
+    shape = means.shape[:-1] + (d, k)
+    first, total, f, f2 = np.split(means, [d * k, 2 * d * k, 2 * d * k + k], axis=-1)
+    var = (f2 - f ** 2)[..., None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return first.reshape(shape) / var, total.reshape(shape) / var
+
+
+def _morris_terms(U, Y, d):
+    """Per-trajectory elementary effects (in unit-cube units): [EE, |EE|, EE**2]."""
+    points = U.reshape(-1, d + 1, d)
+    r = len(points)
+    outputs = Y.reshape(r, d + 1, -1)
+    moves = np.diff(points, axis=1)  # (r, d steps, d coords)
+    moved = np.argmax(np.abs(moves), axis=2)
+    step = np.take_along_axis(moves, moved[..., None], axis=2)
+    EE = np.empty((r, d, outputs.shape[-1]))
+    EE[np.arange(r)[:, None], moved] = np.diff(outputs, axis=1) / step
+    EE = EE.reshape(r, -1)
+    return np.concatenate([EE, np.abs(EE), EE ** 2], axis=1)
+
+
+def _morris_indices(means, d, r):
+    """(mu, mu_star, sigma), each means.shape[:-1] + (d, n_outputs)."""
+    mu, mu_star, ee2 = np.split(means, 3, axis=-1)
+    shape = means.shape[:-1] + (d, -1)
+    sigma = np.sqrt(np.maximum(ee2 - mu ** 2, 0.0) * r / (r - 1))
+    return mu.reshape(shape), mu_star.reshape(shape), sigma.reshape(shape)
+
+
+# =========================
+# Analyses
+# =========================
+
+def _result(method, model, names, n_evaluations, **indices):
+    return dict(method=method, model=model, parameters=list(names),
+                outputs=list(MODELS[model][2]), n_evaluations=int(n_evaluations), **indices)
+
+
+def sobol_analysis(model, n=1024, parameters=None, n_boot=1000, confidence=0.95, seed=None,
+                   chunk_size=10_000, workers=None, executor=None):
+    """First-order and total Sobol indices of every model output.
+
+    parameters defaults to all of the model's parameters. Returns a dict whose
+    S1 / ST arrays are (d, n_outputs) and whose S1_ci / ST_ci are
+    (2, d, n_outputs) bootstrap percentile intervals.
+    """
+    names = tuple(parameters or MODELS[model][1])
+    d = len(names)
+    U = saltelli_samples(n, d, seed)
+    Y = evaluate_samples(model, scale_samples(U, names), names, chunk_size, workers, executor)
+    Y = Y - Y[:2 * n].mean(axis=0)  # centring leaves the indices unchanged, lowers their variance
+    terms = _sobol_terms(Y[:n], Y[n:2 * n], Y[2 * n:].reshape(d, n, -1))
+    S1, ST = _sobol_indices(terms.mean(axis=0), d)
+    boot_S1, boot_ST = _sobol_indices(_bootstrap_means(terms, n_boot, seed), d)
+    return _result("sobol", model, names, len(U), S1=S1, ST=ST,
+                   S1_ci=_interval(boot_S1, confidence), ST_ci=_interval(boot_ST, confidence))
+
+
+def morris_analysis(model, r=100, parameters=None, levels=4, n_boot=1000, confidence=0.95,
+                    seed=None, chunk_size=10_000, workers=None, executor=None):
+    """Morris elementary-effect screening of every model output.
+
+    Returns mu, mu_star and sigma, each (d, n_outputs), with effects measured
+    per unit of the scaled [0, 1] range. mu_star_ci is a bootstrap interval
+    over trajectories.
+    """
+    names = tuple(parameters or MODELS[model][1])
+    d = len(names)
+    U = morris_samples(r, d, levels, seed)
+    Y = evaluate_samples(model, scale_samples(U, names), names, chunk_size, workers, executor)
+    terms = _morris_terms(U, Y, d)
+    mu, mu_star, sigma = _morris_indices(terms.mean(axis=0), d, r)
+    boot = _morris_indices(_bootstrap_means(terms, n_boot, seed), d, r)[1]
+    return _result("morris", model, names, len(U), mu=mu, mu_star=mu_star, sigma=sigma,
+                   mu_star_ci=_interval(boot, confidence))
+
+
+ANALYSES = {"sobol": sobol_analysis, "morris": morris_analysis}
+
+
+def format_result(result):
+    """Plain-text table of one analysis, one block per output."""
+    if result["method"] == "sobol":
+        columns = [("S1", "S1"), ("S1 ci", "S1_ci"), ("ST", "ST"), ("ST ci", "ST_ci")]
+    else:
+        columns = [("mu*", "mu_star"), ("mu* ci", "mu_star_ci"), ("mu", "mu"), ("sigma", "sigma")]
+    lines = [f"{result['method']} {result['model']}: {result['n_evaluations']} evaluations"]
+    for j, output in enumerate(result["outputs"]):
+        lines.append(f"\n{output:12s}" + "".join(f"{label:>20s}" for label, _ in columns))
+        for i, name in enumerate(result["parameters"]):
+            cells = []
+            for _, key in columns:
+                value = np.asarray(result[key])
+                cells.append(f"[{value[0, i, j]:8.4f},{value[1, i, j]:8.4f}]" if key.endswith("_ci")
+                             else f"{value[i, j]:20.4f}")
+            lines.append(f"{name:12s}" + "".join(f"{c:>20s}" for c in cells))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sobol / Morris global sensitivity analysis")
+    parser.add_argument("method", choices=sorted(ANALYSES))
+    parser.add_argument("model", choices=sorted(MODELS))
+    parser.add_argument("-n", type=int, default=1024,
+                        help="Sobol base samples (power of two) or Morris trajectories")
+    parser.add_argument("--params", nargs="+", choices=sorted(PARAMETERS),
+                        help="parameters to vary (default: all of the model's)")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="bootstrap resamples")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="rows per model call")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0: serial)")
+    parser.add_argument("--output", help="write the indices as JSON")
+    args = parser.parse_args()
+    unknown = sorted(set(args.params or ()) - set(MODELS[args.model][1]))
+    if unknown:
+        parser.error(f"model {args.model} has no parameter(s) {', '.join(unknown)} "
+                     f"(choose from {', '.join(MODELS[args.model][1])})")
+
+    size = {"sobol": "n", "morris": "r"}[args.method]
+    result = ANALYSES[args.method](args.model, parameters=args.params, n_boot=args.bootstrap,
+                                   confidence=args.confidence, seed=args.seed,
+                                   chunk_size=args.chunk_size, workers=args.workers,
+                                   **{size: args.n})
+    print(format_result(result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=1, default=lambda a: np.asarray(a).tolist())
+
+
+if __name__ == "__main__":
+    main()
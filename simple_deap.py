@@ -1,9 +1,6 @@
 import random
 from deap import base, creator, tools
-
-# 1. Create fitness and individual types
-creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-creator.create("Individual", list, fitness=creator.FitnessMax)
+from fitness_cache import FitnessCache, register_cached_map
 
 import numpy as np
 
@@ -28,28 +25,45 @@ def evaluate(ind):
     error = np.mean((tissue - TARGET_PATTERN)**2)
     return (-error,)
 
-# 2. Toolbox - FIXED: register select here
-toolbox = base.Toolbox()
-toolbox.register("attr_float", random.uniform, 0, 2)
-toolbox.register("individual", tools.initRepeat, creator.Individual, toolbox.attr_float, n=3)
-toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-toolbox.register("evaluate", evaluate)
-toolbox.register("select", tools.selTournament, tournsize=3)
-
-# 3. Run simple evolution
-pop = toolbox.population(n=20)
-print("Starting evolution...")
-
-for gen in range(10):
-    # Evaluate all
-    fitnesses = list(map(toolbox.evaluate, pop))
-    for ind, fit in zip(pop, fitnesses):
-        ind.fitness.values = fit
-    
-    # Select best for next generation
-    pop[:] = toolbox.select(pop, len(pop))
-
-# Get best result
-best = tools.selBest(pop, 1)[0]
-print("Best individual:", [round(x,2) for x in best])
-print("Best fitness:", round(best.fitness.values[0], 4))
+
+def main():
+    # 1. Create fitness and individual types
+    if not hasattr(creator, "SimpleFitnessMax"):
+        creator.create("SimpleFitnessMax", base.Fitness, weights=(1.0,))
+    if not hasattr(creator, "SimpleIndividual"):
+        creator.create("SimpleIndividual", list, fitness=creator.SimpleFitnessMax)
+
+    # 2. Toolbox - FIXED: register select here
+    toolbox = base.Toolbox()
+    toolbox.register("attr_float", random.uniform, 0, 2)
+    toolbox.register("individual", tools.initRepeat, creator.SimpleIndividual, toolbox.attr_float, n=3)
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    toolbox.register("evaluate", evaluate)
+    toolbox.register("select", tools.selTournament, tournsize=3)
+
+    # Tournament copies are re-evaluated every generation; serve them from a cache
+    fitness_cache = FitnessCache(config=dict(target=TARGET_PATTERN))
+    register_cached_map(toolbox, fitness_cache)
+
+    # 3. Run simple evolution
+    pop = toolbox.population(n=20)
+    print("Starting evolution...")
+
+    for gen in range(10):
+        # Evaluate all
+        fitnesses = toolbox.map(toolbox.evaluate, pop)
+        for ind, fit in zip(pop, fitnesses):
+            ind.fitness.values = fit
+
+        # Select best for next generation
+        pop[:] = toolbox.select(pop, len(pop))
+
+    # Get best result
+    best = tools.selBest(pop, 1)[0]
+    print("Best individual:", [round(x,2) for x in best])
+    print("Best fitness:", round(best.fitness.values[0], 4))
+    print("Fitness cache:", fitness_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
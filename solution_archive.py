@@ -0,0 +1,178 @@
+"""Archive of non-dominated and near-optimal GA solutions, indexed over parameter space.
+
+Solutions are stored as parameter vectors with their objective vectors.
+Objective signs follow DEAP weights: +1 is maximised and -1 minimised. A
+candidate is admitted when it is not dominated by the archive or the
+rest of its batch, or when it is near-optimal on one chosen objective
+(e.g. pattern error <= 1e-6). Candidates closer than tol in parameter
+space to a stored solution are rejected as near-duplicates.
+
+Stored parameters are indexed by a cKDTree. Newly admitted points wait in
+a small buffer that is scanned linearly, and the tree is rebuilt once
+rebuild_every points have accumulated. Entries that have since become
+dominated, and are not near-optimal, are pruned at each rebuild. Region
+queries (within, in_box, nearest) cover both the tree and the buffer.
+"""
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def dominated_by(candidates, reference, weights):
+    """Boolean mask: which candidate objective rows are Pareto-dominated by a reference row."""
+    c = np.asarray(candidates, dtype=float) * weights
+    r = np.asarray(reference, dtype=float) * weights
+    out = np.zeros(len(c), dtype=bool)
+    if not len(r):
+        return out
+    block = max(1, 2 ** 22 // (r.size or 1))  # bound the (block, m, k) comparison arrays
+    for start in range(0, len(c), block):
+        cb = c[start:start + block, None, :]
+        ge = (r[None] >= cb).all(axis=2)
+        gt = (r[None] > cb).any(axis=2)
+        out[start:start + block] = (ge & gt).any(axis=1)
+    return out
+
+
+class SolutionArchive:
+    """KD-tree indexed store of non-dominated and near-optimal solutions.
+
+    near_optimal is (objective index, threshold); solutions whose objective
+    is at least that good are kept even when dominated. None disables it.
+    """
+
+    def __init__(self, weights, tol=1e-3, near_optimal=None, rebuild_every=256):
+        self.weights = np.asarray(weights, dtype=float)
+        self.tol = tol
+        self.near_optimal = near_optimal
+        self.rebuild_every = rebuild_every
+        self.params = np.empty((0, 0))
+        self.objectives = np.empty((0, len(self.weights)))
+        self._tree = None
+        self._indexed = 0
+        self.rejected_duplicates = 0
+
+    def __len__(self):
+        return len(self.objectives)
+
+    def _is_near_optimal(self, objectives):
+        if self.near_optimal is None:
+            return np.zeros(len(objectives), dtype=bool)
+        index, threshold = self.near_optimal
+        return objectives[:, index] * self.weights[index] >= threshold * self.weights[index]
+
+    def _duplicates(self, params):
+        """Candidates within tol of a stored solution (tree, then buffer)."""
+        dup = np.zeros(len(params), dtype=bool)
+        if self._tree is not None:
+            dist, _ = self._tree.query(params, k=1, distance_upper_bound=self.tol)
+            dup |= np.isfinite(dist)
+        if len(self) > self._indexed:
+            buffer = self.params[self._indexed:]
+            dist = np.linalg.norm(params[:, None, :] - buffer[None, :, :], axis=2)
+            dup |= (dist <= self.tol).any(axis=1)
+        return dup
+
+    def add(self, params, objectives):
+        """Admit the qualifying candidates of a batch; returns how many were stored."""
+        params = np.asarray(params, dtype=float).reshape(len(objectives), -1)
+        objectives = np.asarray(objectives, dtype=float).reshape(len(params), -1)
+        if not len(self):
+            self.params = np.empty((0, params.shape[1]))
+
+        reference = np.concatenate([self.objectives, objectives])
+        keep = self._is_near_optimal(objectives) | ~dominated_by(objectives, reference, self.weights)
+        duplicate = self._duplicates(params)
+        self.rejected_duplicates += int((keep & duplicate).sum())
+        keep &= ~duplicate
+
+        accepted = []  # duplicates inside the batch: first come, first kept
+        for i in np.flatnonzero(keep):
+            if all(np.linalg.norm(params[i] - params[j]) > self.tol for j in accepted):
+                accepted.append(i)
+            else:
+                self.rejected_duplicates += 1
+        self.params = np.concatenate([self.params, params[accepted]])
+        self.objectives = np.concatenate([self.objectives, objectives[accepted]])
+        if len(self) - self._indexed >= self.rebuild_every:
+            self.rebuild()
+        return len(accepted)
+
+    def rebuild(self):
+        """Prune entries now dominated (unless near-optimal) and re-index everything."""
+        if not len(self):
+            return
+        keep = self._is_near_optimal(self.objectives) | ~dominated_by(
+            self.objectives, self.objectives, self.weights)
+        self.params, self.objectives = self.params[keep], self.objectives[keep]
+        self._tree = cKDTree(self.params) if len(self) else None
+        self._indexed = len(self)
+
+    # =========================
+    # Queries
+    # =========================
+
+    def pareto_front(self):
+        """(params, objectives) of the currently non-dominated entries."""
+        front = ~dominated_by(self.objectives, self.objectives, self.weights)
+        return self.params[front], self.objectives[front]
+
+    def _select(self, index):
+        index = np.sort(np.asarray(index, dtype=int))
+        return self.params[index], self.objectives[index]
+
+    def within(self, center, radius):
+        """(params, objectives) of every entry within radius of center."""
+        center = np.asarray(center, dtype=float)
+        index = list(self._tree.query_ball_point(center, radius)) if self._tree is not None else []
+        buffer = self.params[self._indexed:]
+        index += (self._indexed + np.flatnonzero(
+            np.linalg.norm(buffer - center, axis=1) <= radius)).tolist()
+        return self._select(index)
+
+    def in_box(self, low, high):
+        """(params, objectives) of entries with low <= params <= high (per coordinate)."""
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        index = np.arange(self._indexed, len(self))
+        if self._tree is not None:  # the box lies inside the ball through its corners
+            ball = self._tree.query_ball_point((low + high) / 2, np.linalg.norm(high - low) / 2)
+            index = np.concatenate([np.asarray(ball, dtype=int), index])
+        points = self.params[index]
+        return self._select(index[np.all((points >= low) & (points <= high), axis=1)])
+
+    def nearest(self, point, k=1):
+        """(params, objectives, distances) of the k entries nearest to point."""
+        point = np.asarray(point, dtype=float)
+        index = [np.arange(self._indexed, len(self))]
+        dist = [np.linalg.norm(self.params[index[0]] - point, axis=1)]
+        if self._tree is not None:
+            tree_dist, tree_index = self._tree.query(point, k=min(k, self._indexed))
+            dist.append(np.atleast_1d(tree_dist))
+            index.append(np.atleast_1d(tree_index))
+        dist, index = np.concatenate(dist), np.concatenate(index)
+        order = np.argsort(dist, kind="stable")[:k]
+        return self.params[index[order]], self.objectives[index[order]], dist[order]
+
+    # =========================
+    # Persistence
+    # =========================
+
+    def save(self, path):
+        """Write params, objectives and settings to an .npz file (atomic replace)."""
+        tmp = path + ".tmp.npz"
+        near = (np.nan, np.nan) if self.near_optimal is None else self.near_optimal
+        np.savez(tmp, params=self.params, objectives=self.objectives, weights=self.weights,
+                 tol=self.tol, near_optimal=np.array(near, dtype=float))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, rebuild_every=256):
+        with np.load(path) as data:
+            near = data["near_optimal"]
+            archive = cls(data["weights"], float(data["tol"]),
+                          None if np.isnan(near).any() else (int(near[0]), float(near[1])),
+                          rebuild_every)
+            archive.params, archive.objectives = data["params"], data["objectives"]
+        archive.rebuild()
+        return archive
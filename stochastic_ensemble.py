@@ -0,0 +1,207 @@
+"""Batched stochastic ensembles of the noisy 1-D chain model of figure5_minimal.py.
+
+A healthy chain receives Gaussian noise every step. A propranolol chain has
+its left half decaying while neighbour diffusion spreads the change. Many
+realizations advance together as (n_realizations, N) arrays. Realization i
+draws its noise from its own counter-based stream: Philox keyed by
+SeedSequence(seed, spawn_key=(i,)). Its trajectory therefore depends only
+on (seed, i), whatever the chunk size or worker count. Each chunk's final
+profiles go into mergeable streaming statistics, and no trajectory is kept:
+
+    result = run_ensemble(10_000, seed=0, workers=4)
+    result["disruption"].mean, result["disruption"].quantile([0.025, 0.975])
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+N = 50
+STEPS = 200
+NOISE_SD = 0.01
+DECAY = 0.995  # per-step decay of the propranolol (left) half
+DIFFUSION = 0.05 * 0.8
+
+
+# =========================
+# Model
+# =========================
+
+def initial_profiles(n=None):
+    """Healthy (ones) and propranolol (left half 0.7) chains, shape (N,) or (n, N)."""
+    shape = (N,) if n is None else (n, N)
+    healthy, propranolol = np.ones(shape), np.ones(shape)
+    propranolol[..., :N // 2] = 0.7
+    return healthy, propranolol
+
+
+def minimal_step(healthy, propranolol, noise):
+    """Advance (..., N) chains by one step in place; noise is added to healthy.
+
+    Diffusion is the second difference with zero-flux ends, evaluated before
+    the left half decays.
+    """
+    healthy += noise
+    edges = dict(prepend=propranolol[..., :1], append=propranolol[..., -1:])
+    diffusion = DIFFUSION * np.diff(propranolol, 2, axis=-1, **edges)
+    propranolol[..., :N // 2] *= DECAY
+    propranolol += diffusion
+
+
+def disruption(healthy, propranolol):
+    """% disruption 100 * (1 - mean(propranolol) / mean(healthy)) per realization."""
+    return 100 * (1 - propranolol.mean(axis=-1) / healthy.mean(axis=-1))
+
+
+def realization_stream(seed, index):
+    """Independent Philox generator of realization index under seed."""
+    return np.random.Generator(np.random.Philox(np.random.SeedSequence(seed, spawn_key=(index,))))
+
+
+def simulate_chunk(seed, start, stop, steps=STEPS, noise_sd=NOISE_SD, block=50):
+    """Final (healthy, propranolol) profiles of realizations start..stop-1, each (n, N).
+
+    Noise is drawn block steps at a time from each realization's stream;
+    consecutive draws continue the stream, so the block size does not change
+    the result.
+    """
+    streams = [realization_stream(seed, i) for i in range(start, stop)]
+    healthy, propranolol = initial_profiles(stop - start)
+    for first in range(0, steps, block):
+        k = min(block, steps - first)
+        noise = np.stack([s.normal(0, noise_sd, (k, N)) for s in streams], axis=1)
+        for step_noise in noise:
+            minimal_step(healthy, propranolol, step_noise)
+    return healthy, propranolol
+
+
+# =========================
+# Streaming statistics
+# =========================
+
+class StreamingStats:
+    """Mergeable per-element count, mean, variance and histogram quantiles.
+
+    update() folds in a batch of shape (n,) + shape and merge() another
+    StreamingStats (Chan et al. pairwise update). Values are also counted
+    into bins equal-width bins on [low, high], with values outside the range
+    going to the edge bins. Quantiles are therefore accurate to
+    (high - low) / bins.
+    """
+
+    def __init__(self, shape=(), low=0.0, high=1.0, bins=1000):
+        self.shape = tuple(shape)
+        self.edges = np.linspace(low, high, bins + 1)
+        self.count = 0
+        self.mean = np.zeros(self.shape)
+        self.m2 = np.zeros(self.shape)
+        self.hist = np.zeros(self.shape + (bins,), dtype=np.int64)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).reshape((-1,) + self.shape)
+        if not len(values):
+            return
+        mean = values.mean(axis=0)
+        self._combine(len(values), mean, ((values - mean) ** 2).sum(axis=0))
+        bins = self.hist.shape[-1]
+        idx = np.clip(np.searchsorted(self.edges, values, side="right") - 1, 0, bins - 1)
+        size = int(np.prod(self.shape))
+        flat = idx.reshape(len(values), size) + bins * np.arange(size)
+        self.hist += np.bincount(flat.ravel(), minlength=size * bins).reshape(self.hist.shape)
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+            self.hist += other.hist
+        return self
+
+    @property
+    def var(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.full(self.shape, np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def quantile(self, q):
+        """Quantiles from the histogram (linear within a bin), shape q.shape + shape."""
+        q = np.asarray(q, dtype=float)
+        hist = self.hist.reshape(-1, self.hist.shape[-1])
+        cum = np.cumsum(hist, axis=1)
+        rows = np.arange(len(hist))
+        width = self.edges[1] - self.edges[0]
+        out = []
+        for rank in q.ravel() * self.count:
+            b = np.argmax(cum >= max(rank, 1e-12), axis=1)  # first bin reaching the rank
+            below = cum[rows, b] - hist[rows, b]
+            frac = np.clip((rank - below) / np.maximum(hist[rows, b], 1), 0, 1)
+            out.append(self.edges[b] + frac * width)
+        return np.reshape(out, q.shape + self.shape)
+
+
+# =========================
+# Ensemble driver
+# =========================
+
+PROFILE_RANGE = (0.0, 2.0)
+DISRUPTION_RANGE = (0.0, 100.0)
+
+
+def _empty_stats(bins):
+    return {"healthy": StreamingStats((N,), *PROFILE_RANGE, bins),
+            "propranolol": StreamingStats((N,), *PROFILE_RANGE, bins),
+            "disruption": StreamingStats((), *DISRUPTION_RANGE, bins)}
+
+
+def _chunk_stats(seed, bounds, steps, noise_sd, bins):
+    healthy, propranolol = simulate_chunk(seed, *bounds, steps=steps, noise_sd=noise_sd)
+    stats = _empty_stats(bins)
+    stats["healthy"].update(healthy)
+    stats["propranolol"].update(propranolol)
+    values = disruption(healthy, propranolol)
+    stats["disruption"].update(values)
+    return stats, values
+
+
+def _merge_chunks(result, samples, parts):
+    """Fold (stats, values) chunk results into result as they arrive, in chunk order.
+
+    Only the current chunk's statistics are held, so memory does not grow
+    with the number of chunks; summaries do not depend on scheduling.
+    """
+    for stats, values in parts:
+        for name, s in stats.items():
+            result[name].merge(s)
+        samples.append(values)
+
+
+def run_ensemble(n_realizations, seed=None, chunk_size=1000, workers=None, steps=STEPS,
+                 noise_sd=NOISE_SD, bins=2000):
+    """Streaming summary of n_realizations independent runs of the chain model.
+
+    Returns a dict holding StreamingStats for the final "healthy" and
+    "propranolol" profiles (per cell) and for the % "disruption". It also
+    holds "disruption_samples", one value per realization (identical for any
+    chunk_size or workers), and the "seed" used. With seed=None, fresh entropy
+    is drawn and recorded. Chunks run in worker processes when workers > 1.
+    """
+    seed = np.random.SeedSequence().entropy if seed is None else seed
+    bounds = [(a, min(a + chunk_size, n_realizations)) for a in range(0, n_realizations, chunk_size)]
+    args = (repeat(seed), bounds, repeat(steps), repeat(noise_sd), repeat(bins))
+    result = _empty_stats(bins)
+    samples = []
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            _merge_chunks(result, samples, pool.map(_chunk_stats, *args))
+    else:
+        _merge_chunks(result, samples, map(_chunk_stats, *args))
+    result["disruption_samples"] = np.concatenate(samples) if samples else np.empty(0)
+    result["seed"] = seed
+    return result
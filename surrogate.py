@@ -0,0 +1,142 @@
+"""Surrogate-assisted stage-3 evolution.
+
+An RBF interpolant of log10(MSE) over the (k1, k2, k3) genomes simulated so
+far pre-screens each generation's offspring. Only the best-predicted fraction
+of the offspring, plus a random exploration quota, goes to the real
+simulator. The rest carry their predicted fitness and are screened again in
+the next generation. Every real evaluation is also used to score the
+surrogate: the rank correlation between its predictions and the simulated
+values, averaged over recent generations. While that score is below
+min_rank_corr, the run falls back to simulating every offspring. The hall of
+fame only ever receives simulated individuals.
+"""
+import math
+import random
+
+import numpy as np
+from deap import algorithms, tools
+from scipy.interpolate import RBFInterpolator
+from scipy.stats import spearmanr
+
+from parallel_evolution import make_stage3_toolbox
+
+_LOG_FLOOR = 1e-300
+
+
+class RBFSurrogate:
+    """Thin-plate RBF emulator of log10(MSE), refit lazily as evaluations arrive.
+
+    Genomes closer than 10**-decimals are merged (keeping the latest value) so
+    the interpolation matrix stays nonsingular. With more than max_points
+    samples only the best max_points are kept; neighbors limits each
+    prediction to a local RBF fit so refits stay cheap.
+    """
+
+    def __init__(self, max_points=2000, neighbors=64, smoothing=1e-8, decimals=9):
+        self.max_points = max_points
+        self.neighbors = neighbors
+        self.smoothing = smoothing
+        self.decimals = decimals
+        self._samples = {}
+        self._model = None
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, genomes, mse):
+        for genome, value in zip(np.asarray(genomes, dtype=float), np.asarray(mse, dtype=float)):
+            self._samples[tuple(np.round(genome, self.decimals))] = np.log10(max(value, _LOG_FLOOR))
+        if len(self._samples) > self.max_points:
+            kept = sorted(self._samples.items(), key=lambda item: item[1])[:self.max_points]
+            self._samples = dict(kept)
+        self._model = None
+
+    def _fit(self):
+        X = np.array(list(self._samples), dtype=float)
+        y = np.array(list(self._samples.values()))
+        self._model = RBFInterpolator(X, y, kernel="thin_plate_spline", smoothing=self.smoothing,
+                                      neighbors=min(self.neighbors, len(y)))
+
+    def predict(self, genomes):
+        """Predicted MSE for each genome."""
+        if self._model is None:
+            self._fit()
+        return 10.0 ** self._model(np.asarray(genomes, dtype=float).reshape(-1, 3))
+
+
+def run_surrogate_ga(target, k3_scale, t, y0=(1, 1), n=100, ngen=50, cxpb=0.5, mutpb=0.2,
+                     fraction=0.2, explore=0.05, min_points=30, min_rank_corr=0.6, window=3,
+                     seed=None, hof_size=3, verbose=False, surrogate=None):
+    """eaSimple with surrogate pre-screening of offspring; returns (pop, logbook, hof).
+
+    Each generation the best `fraction` of the offspring by predicted MSE, plus
+    `explore` of them drawn at random, are simulated. Screening starts once the
+    surrogate holds min_points samples and is suspended while the mean rank
+    correlation over the last `window` generations is below min_rank_corr.
+    Logbook rows carry gen, nevals (simulations), npred, screened, rank_corr
+    and min (best simulated MSE so far).
+    """
+    if seed is not None:
+        random.seed(seed)
+    toolbox = make_stage3_toolbox(target, k3_scale, t, y0)
+    surrogate = RBFSurrogate() if surrogate is None else surrogate
+    hof = tools.HallOfFame(hof_size)
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "nevals", "npred", "screened", "rank_corr", "min"]
+    scores = []
+
+    def simulate(individuals):
+        fits = list(toolbox.map(toolbox.evaluate, individuals))
+        for ind, fit in zip(individuals, fits):
+            ind.fitness.values = fit
+            ind.predicted = False
+        surrogate.add(individuals, [fit[0] for fit in fits])
+        hof.update(individuals)
+
+    pop = toolbox.population(n=n)
+    simulate(pop)
+    logbook.record(gen=0, nevals=len(pop), npred=0, screened=False, rank_corr=np.nan,
+                   min=hof[0].fitness.values[0])
+    if verbose:
+        print(logbook.stream)
+
+    for gen in range(1, ngen + 1):
+        offspring = algorithms.varAnd(toolbox.select(pop, len(pop)), toolbox, cxpb, mutpb)
+        for ind in offspring:
+            if getattr(ind, "predicted", False):  # re-screen against the refreshed surrogate
+                del ind.fitness.values
+        invalid = [ind for ind in offspring if not ind.fitness.valid]
+
+        ready = len(surrogate) >= min_points
+        screened = ready and (len(scores) < window or bool(np.mean(scores[-window:]) >= min_rank_corr))
+        pred = surrogate.predict(invalid) if ready and invalid else None
+        if screened:
+            order = np.argsort(pred)
+            n_best = math.ceil(fraction * len(invalid))
+            rest = order[n_best:].tolist()
+            n_explore = min(len(rest), math.ceil(explore * len(invalid)))
+            chosen = set(order[:n_best].tolist()) | set(random.sample(rest, n_explore))
+        else:
+            chosen = set(range(len(invalid)))
+
+        real = [invalid[i] for i in sorted(chosen)]
+        if real:
+            simulate(real)
+        for i, ind in enumerate(invalid):
+            if i not in chosen:
+                ind.fitness.values = (float(pred[i]),)
+                ind.predicted = True  # copied along by toolbox.clone
+
+        rank_corr = np.nan
+        if pred is not None and len(real) > 2:
+            truth = np.array([ind.fitness.values[0] for ind in real])
+            rank_corr = spearmanr(pred[sorted(chosen)], truth)[0]
+            if np.isfinite(rank_corr):
+                scores.append(rank_corr)
+
+        pop[:] = offspring
+        logbook.record(gen=gen, nevals=len(real), npred=len(invalid) - len(real),
+                       screened=screened, rank_corr=rank_corr, min=hof[0].fitness.values[0])
+        if verbose:
+            print(logbook.stream)
+    return pop, logbook, hof
@@ -1,93 +1,240 @@
+import argparse
+import csv
 import random
+import instrumentation
 import numpy as np
 from deap import base, creator, tools
-from scipy.integrate import odeint
+from population_eval import evaluate_population, register_batched_map
+from tissue_sim import simulate_tissue
+from fitness_cache import FitnessCache, register_cached_map
+from solution_archive import SolutionArchive
 
-# 1. Your single-cell model
-def bioelectric_model(y, t, k1, k2, k3):
-    X, V = y
-    return [k1 * V - k2 * X * V, -k3 * V]
+# 1. Your single-cell model: closed form in bioelectric_solver, via tissue_sim
 
 # 2. Tissue simulation using 10 independent cells
+N_CELLS = 10
+T = np.linspace(0, 100, 200)  # time points
+Y0 = [1.0, -40.0]  # initial X, V (example)
+
 def run_tissue_simulation(params):
     """Use your ODE on 10 independent cells to build a 1D 'tissue'."""
-    k1, k2, k3 = params
-    n_cells = 10
-    t = np.linspace(0, 100, 200)  # time points
-    V_final = []
-
-    for _ in range(n_cells):
-        y0 = [1.0, -40.0]  # initial X, V (example)
-        sol = odeint(bioelectric_model, y0, t, args=(k1, k2, k3))
-        X_t, V_t = sol.T
-        V_final.append(V_t[-1])  # final voltage of this cell
-
-    return np.array(V_final)  # shape (10,)
+    # Identical cells are solved once and broadcast to all N_CELLS
+    V_final = simulate_tissue(params, np.ones(N_CELLS), T, Y0)
+    return V_final  # shape (10,)
 
 # Baseline target: final voltages with default params [1,1,1]
 BASELINE_PARAMS = [1.0, 1.0, 1.0]
 TARGET_PATTERN = run_tissue_simulation(BASELINE_PARAMS)
 
-# 3. DEAP types
-creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-creator.create("Individual", list, fitness=creator.FitnessMax)
-
-# 4. Toolbox
-toolbox = base.Toolbox()
-toolbox.register("attr_float", random.uniform, 0, 2)
-toolbox.register("individual", tools.initRepeat, creator.Individual, toolbox.attr_float, n=3)
-toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-
 def evaluate(ind):
     """Fitness = how close final voltages match target pattern."""
     tissue = run_tissue_simulation(ind)            # shape (10,)
     error = np.mean((tissue - TARGET_PATTERN)**2)  # scalar
     return (-error,)  # DEAP maximizes fitness, so use negative error
 
-toolbox.register("evaluate", evaluate)
-toolbox.register("select", tools.selTournament, tournsize=3)
-
-
-# 4. Run evolution
-if __name__ == "__main__":
+def evaluate_batch(params):
+    """Population version of evaluate: (pop_size, 3) genomes -> fitness array."""
+    return -evaluate_population(params, TARGET_PATTERN, np.ones(N_CELLS), T, Y0)
+
+
+def make_toolbox(fitness_cache=None):
+    """DEAP types and toolbox for the figure-6 run (types are created on first call)."""
+    # 3. DEAP types
+    if not hasattr(creator, "Figure6FitnessMax"):
+        creator.create("Figure6FitnessMax", base.Fitness, weights=(1.0,))
+    if not hasattr(creator, "Figure6Individual"):
+        creator.create("Figure6Individual", list, fitness=creator.Figure6FitnessMax)
+
+    # 4. Toolbox
+    toolbox = base.Toolbox()
+    toolbox.register("attr_float", random.uniform, 0, 2)
+    toolbox.register("individual", tools.initRepeat, creator.Figure6Individual, toolbox.attr_float, n=3)
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    toolbox.register("evaluate", evaluate)
+    toolbox.register("select", tools.selTournament, tournsize=3)
+    register_batched_map(toolbox, evaluate_batch)
+
+    # Selection only clones survivors, so re-evaluating them hits the cache
+    if fitness_cache is not None:
+        register_cached_map(toolbox, fitness_cache)
+    return toolbox
+
+
+# 5. Multi-objective mode: NSGA-II plus an archive of degenerate solutions
+BOUNDS = (0.0, 2.0)  # same range as attr_float
+# pattern error (min) x distance from baseline (max: how far parameters can move
+# while keeping the state) x drug burden (min: change of k3, the drug-targeted conductance)
+MO_WEIGHTS = (-1.0, 1.0, -1.0)
+MO_OBJECTIVES = ("pattern_error", "baseline_distance", "drug_burden")
+
+
+def evaluate_objectives_batch(params):
+    """(pop_size, 3) genomes -> (pop_size, 3) objective matrix in MO_OBJECTIVES order."""
+    params = np.asarray(params, dtype=float).reshape(-1, 3)
+    error = evaluate_population(params, TARGET_PATTERN, np.ones(N_CELLS), T, Y0)
+    distance = np.linalg.norm(params - BASELINE_PARAMS, axis=1)
+    burden = np.abs(params[:, 2] - BASELINE_PARAMS[2])
+    return np.column_stack([error, distance, burden])
+
+
+def evaluate_objectives(ind):
+    return tuple(evaluate_objectives_batch([ind])[0])
+
+
+def make_mo_toolbox():
+    """NSGA-II toolbox: SBX crossover and polynomial mutation within BOUNDS."""
+    if not hasattr(creator, "FitnessMO"):
+        creator.create("FitnessMO", base.Fitness, weights=MO_WEIGHTS)
+    if not hasattr(creator, "IndividualMO"):
+        creator.create("IndividualMO", list, fitness=creator.FitnessMO)
+
+    toolbox = base.Toolbox()
+    toolbox.register("attr_float", random.uniform, *BOUNDS)
+    toolbox.register("individual", tools.initRepeat, creator.IndividualMO, toolbox.attr_float, n=3)
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    toolbox.register("evaluate", evaluate_objectives)
+    toolbox.register("mate", tools.cxSimulatedBinaryBounded, low=BOUNDS[0], up=BOUNDS[1], eta=20.0)
+    toolbox.register("mutate", tools.mutPolynomialBounded, low=BOUNDS[0], up=BOUNDS[1], eta=20.0,
+                     indpb=1.0 / 3)
+    toolbox.register("select", tools.selNSGA2)
+    register_batched_map(toolbox, evaluate_objectives_batch)
+    return toolbox
+
+
+def run_nsga2(n=100, ngen=50, cxpb=0.9, seed=None, archive=None, verbose=True):
+    """NSGA-II over MO_OBJECTIVES; every evaluated individual is offered to archive.
+
+    n must be a multiple of 4 (selTournamentDCD). The archive defaults to a
+    SolutionArchive keeping the non-dominated solutions plus every solution
+    with pattern error <= 1e-8. Returns (pop, logbook, archive).
+    """
+    if seed is not None:
+        random.seed(seed)
+    toolbox = make_mo_toolbox()
+    if archive is None:
+        archive = SolutionArchive(MO_WEIGHTS, tol=1e-3, near_optimal=(0, 1e-8))
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "nevals", "archived", "front", "min_error"]
+
+    def evaluate(individuals):
+        invalid = [ind for ind in individuals if not ind.fitness.valid]
+        for ind, fit in zip(invalid, toolbox.map(toolbox.evaluate, invalid)):
+            ind.fitness.values = fit
+        if invalid:
+            archive.add(invalid, [ind.fitness.values for ind in invalid])
+        return len(invalid)
+
+    def record(gen, nevals):
+        front = tools.sortNondominated(pop, len(pop), first_front_only=True)[0]
+        logbook.record(gen=gen, nevals=nevals, archived=len(archive), front=len(front),
+                       min_error=min(ind.fitness.values[0] for ind in pop))
+        if verbose:
+            print(logbook.stream)
+
+    pop = toolbox.population(n=n)
+    nevals = evaluate(pop)
+    pop = toolbox.select(pop, len(pop))  # assigns the crowding distances selTournamentDCD needs
+    record(0, nevals)
+    for gen in range(1, ngen + 1):
+        offspring = [toolbox.clone(ind) for ind in tools.selTournamentDCD(pop, len(pop))]
+        for a, b in zip(offspring[::2], offspring[1::2]):
+            if random.random() <= cxpb:
+                toolbox.mate(a, b)
+            toolbox.mutate(a)
+            toolbox.mutate(b)
+            del a.fitness.values, b.fitness.values
+        nevals = evaluate(offspring)
+        pop = toolbox.select(pop + offspring, n)
+        record(gen, nevals)
+    return pop, logbook, archive
+
+
+def run_multiobjective(archive_path="figure6_archive.npz", seed=None):
+    pop, logbook, archive = run_nsga2(seed=seed)
+    archive.rebuild()
+    archive.save(archive_path)
+    params, objectives = archive.pareto_front()
+    print(f"\nArchive: {len(archive)} solutions ({archive.rejected_duplicates} near-duplicates "
+          f"rejected), {len(params)} on the Pareto front -> {archive_path}")
+    near = archive.objectives[:, 0] <= archive.near_optimal[1]
+    print(f"{int(near.sum())} distinct parameter sets reach the target state; spread per gene:",
+          np.round(np.ptp(archive.params[near], axis=0), 2) if near.any() else "n/a")
+    return [dict(row) for row in logbook]
+
+
+# 6. Run evolution
+def run_evolution():
     test_ind = [1.0, 1.0, 1.0]
     tissue = run_tissue_simulation(test_ind)
     error = np.mean((tissue - TARGET_PATTERN)**2)
     print("Test error at [1,1,1]:", error)
 
+    fitness_cache = FitnessCache(config=dict(target=TARGET_PATTERN, t=T, y0=Y0))
+    toolbox = make_toolbox(fitness_cache)
+    # Evaluate-then-select loop: each evaluation opens a generation
+    instrumentation.instrument_toolbox(toolbox, generation_start="map")
 
-pop = toolbox.population(n=20)
-print("Generation | Best Fitness")
-print("-----------|------------")
+    pop = toolbox.population(n=20)
+    print("Generation | Best Fitness")
+    print("-----------|------------")
 
-gen_list = []
-fit_list = []
+    gen_list = []
+    fit_list = []
 
-for gen in range(15):
-    # Evaluate
-    fitnesses = list(map(toolbox.evaluate, pop))
-    for ind, fit in zip(pop, fitnesses):
-        ind.fitness.values = fit
+    for gen in range(15):
+        # Evaluate
+        fitnesses = toolbox.map(toolbox.evaluate, pop)
+        for ind, fit in zip(pop, fitnesses):
+            ind.fitness.values = fit
 
-    # Select
-    pop[:] = toolbox.select(pop, len(pop))
+        # Select
+        pop[:] = toolbox.select(pop, len(pop))
 
-    best_fitness = max(ind.fitness.values[0] for ind in pop)
-    print(f"{gen:9d} | {best_fitness:10.4f}")
+        best_fitness = max(ind.fitness.values[0] for ind in pop)
+        print(f"{gen:9d} | {best_fitness:10.4f}")
 
-    gen_list.append(gen)
-    fit_list.append(best_fitness)
+        gen_list.append(gen)
+        fit_list.append(best_fitness)
 
 
-# Best result
-best = tools.selBest(pop, 1)[0]
+    # Best result
+    best = tools.selBest(pop, 1)[0]
+
+    with instrumentation.timer("io"), open("figure6_fitness.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["generation", "best_fitness"])
+        writer.writerows(zip(gen_list, fit_list))
+
+    print("\nBEST PARAMS:", [round(x,2) for x in best])
+    print("Final fitness:", best.fitness.values[0])
+    print("Fitness cache:", fitness_cache.stats())
+    return [{"gen": g, "best_fitness": f} for g, f in zip(gen_list, fit_list)]
 
-import csv
 
-with open("figure6_fitness.csv", "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["generation", "best_fitness"])
-    writer.writerows(zip(gen_list, fit_list))
+def main():
+    parser = argparse.ArgumentParser(description="Figure 6 tissue GA")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write solver counters and per-generation stage timings here (JSON)")
+    parser.add_argument("--multiobjective", action="store_true",
+                        help="NSGA-II on pattern error x baseline distance x drug burden, "
+                             "archiving degenerate solutions")
+    parser.add_argument("--archive", default="figure6_archive.npz",
+                        help="where --multiobjective saves the solution archive")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
 
-print("\nBEST PARAMS:", [round(x,2) for x in best])
-print("Final fitness:", best.fitness.values[0])
+    def run():
+        if args.multiobjective:
+            return run_multiobjective(args.archive, args.seed)
+        return run_evolution()
+
+    if not args.profile:
+        run()
+        return
+    with instrumentation.profiling(instrumentation.Profile("figure6_ga")) as profile:
+        logbook = run()
+    profile.save(args.profile, logbook)
+
+
+if __name__ == "__main__":
+    main()
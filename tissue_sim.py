@@ -0,0 +1,47 @@
+"""Uncoupled tissue layer: per-cell parameters, drug masks and deduplicated solves.
+
+Cells of an uncoupled tissue only differ through their parameter tuple and
+initial condition, so each unique (k1, k2, k3, X0, V0) is solved once and
+scattered back onto the grid. This works for any per-cell drug mask.
+"""
+import numpy as np
+import instrumentation
+from bioelectric_solver import bioelectric_model, batched_final_state
+
+
+def half_mask(N, M=None):
+    """Boolean drug mask covering the left half of an N x M grid (columns j < M // 2)."""
+    M = N if M is None else M
+    mask = np.zeros((N, M), dtype=bool)
+    mask[:, :M // 2] = True
+    return mask
+
+
+def k3_scale_from_mask(mask, factor=2.0, k3_baseline=0.01):
+    """Per-cell k3 multiplier: k3_baseline everywhere, times factor where mask is set."""
+    mask = np.asarray(mask, dtype=bool)
+    return np.where(mask, k3_baseline * factor, k3_baseline)
+
+
+def unique_final_states(k1, k2, k3, X0, V0, t, model=bioelectric_model):
+    """Final (X, V) for per-cell arrays, solving each unique cell only once.
+
+    All arguments broadcast to a common grid shape; returns grid.shape + (2,).
+    """
+    cols = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (k1, k2, k3, X0, V0)))
+    shape = cols[0].shape
+    table = np.stack([c.ravel() for c in cols], axis=1)
+    uniq, inverse = np.unique(table, axis=0, return_inverse=True)
+    instrumentation.count("tissue.cells", len(table))
+    instrumentation.count("tissue.unique_cells", len(uniq))
+    states = batched_final_state(model, (uniq[:, 3], uniq[:, 4]), t,
+                                 args=(uniq[:, 0], uniq[:, 1], uniq[:, 2]))
+    return states[inverse.ravel()].reshape(shape + (2,))
+
+
+def simulate_tissue(params, k3_scale, t, y0=(1, 1), model=bioelectric_model):
+    """Final Vnorm on every cell for one [k1, k2, k3]; cell k3 is k3 * k3_scale."""
+    k1, k2, k3 = params
+    states = unique_final_states(k1, k2, k3 * np.asarray(k3_scale, dtype=float),
+                                 y0[0], y0[1], t, model)
+    return states[..., 1]
@@ -0,0 +1,231 @@
+"""Memory-mapped on-disk store for full tissue trajectories.
+
+A store is a directory holding one .npy array per variable, shaped
+(len(t), N, M) and opened with np.lib.format.open_memmap, plus meta.json
+(grid shape, time grid, dt, dtype, scalar parameters, frames written) and
+optional mask.npy / params.npz for the drug mask and per-cell parameters.
+The writer fills frames in place and flushes every chunk_steps frames, so
+only the engine's current state is held in RAM. Readers slice by time window
+and region straight from the memmap:
+
+    with TrajectoryWriter("run", (1000, 1000), t, mask=mask, params=dict(k1=1, k2=0.1)) as store:
+        simulate_coupled_tissue(1, 0.1, k3, (1000, 1000), t, store=store)
+    V = TrajectoryReader("run").read("V", t0=10, t1=20, rows=slice(0, 100))
+"""
+import json
+import os
+
+import numpy as np
+
+META = "meta.json"
+
+
+class TrajectoryWriter:
+    """Stream (X, V) frames on the time grid t into memory-mapped arrays under path."""
+
+    def __init__(self, path, shape, t, variables=("V",), dtype=np.float64, params=None,
+                 mask=None, chunk_steps=64):
+        self.path = path
+        self.shape = tuple(shape)
+        self.t = np.asarray(t, dtype=float)
+        self.variables = tuple(variables)
+        self.dtype = np.dtype(dtype)
+        self.chunk_steps = int(chunk_steps)
+        self.n_written = 0
+        os.makedirs(path, exist_ok=True)
+
+        self.params, arrays = {}, {}
+        for name, value in (params or {}).items():
+            if np.ndim(value) == 0:
+                self.params[name] = float(value)
+            else:
+                arrays[name] = np.asarray(value)
+        if arrays:
+            np.savez(os.path.join(path, "params.npz"), **arrays)
+        if mask is not None:
+            np.save(os.path.join(path, "mask.npy"), np.broadcast_to(mask, self.shape))
+        self.has_mask = mask is not None
+
+        self._arrays = {
+            var: np.lib.format.open_memmap(os.path.join(path, f"{var}.npy"), mode="w+",
+                                           dtype=self.dtype, shape=(self.t.size,) + self.shape)
+            for var in self.variables
+        }
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, **frames):
+        """Write the next frame; pass every stored variable by name (extras are ignored)."""
+        if self.n_written >= self.t.size:
+            raise IndexError(f"store already holds all {self.t.size} frames")
+        for var, array in self._arrays.items():
+            array[self.n_written] = np.reshape(frames[var], self.shape)
+        self.n_written += 1
+        if self.n_written % self.chunk_steps == 0:
+            self.flush()
+
+    def flush(self):
+        """Push written frames to disk and record how many are valid."""
+        for array in self._arrays.values():
+            array.flush()
+        self._write_meta()
+
+    def close(self):
+        if self._arrays:
+            self.flush()
+            self._arrays = {}
+
+    def _write_meta(self):
+        dt = np.diff(self.t)
+        meta = {
+            "shape": list(self.shape),
+            "t": self.t.tolist(),
+            "dt": float(dt[0]) if dt.size and np.allclose(dt, dt[0]) else None,
+            "variables": list(self.variables),
+            "dtype": self.dtype.str,
+            "params": self.params,
+            "has_mask": self.has_mask,
+            "n_written": self.n_written,
+        }
+        tmp = os.path.join(self.path, META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, META))
+
+
+class TrajectoryReader:
+    """Read-only view of a trajectory store; slices never load the whole file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META)) as f:
+            self.meta = json.load(f)
+        self.shape = tuple(self.meta["shape"])
+        self.n_frames = self.meta["n_written"]
+        self.t = np.asarray(self.meta["t"])[:self.n_frames]
+        self._arrays = {}
+
+    def __repr__(self):
+        return (f"TrajectoryReader({self.path!r}, shape={self.shape}, frames={self.n_frames}, "
+                f"variables={self.meta['variables']})")
+
+    def array(self, var="V"):
+        """The read-only memmap for var, restricted to the frames actually written."""
+        if var not in self._arrays:
+            if var not in self.meta["variables"]:
+                raise KeyError(f"{var!r} not stored; have {self.meta['variables']}")
+            self._arrays[var] = np.load(os.path.join(self.path, f"{var}.npy"), mmap_mode="r")
+        return self._arrays[var][:self.n_frames]
+
+    @property
+    def mask(self):
+        return np.load(os.path.join(self.path, "mask.npy")) if self.meta["has_mask"] else None
+
+    @property
+    def params(self):
+        """Scalar parameters from the header merged with any per-cell arrays."""
+        params = dict(self.meta["params"])
+        path = os.path.join(self.path, "params.npz")
+        if os.path.exists(path):
+            with np.load(path) as arrays:
+                params.update({name: arrays[name] for name in arrays.files})
+        return params
+
+    def time_slice(self, t0=None, t1=None, step=1):
+        """Frame indices with t0 <= t <= t1 as a slice."""
+        start = 0 if t0 is None else int(np.searchsorted(self.t, t0, side="left"))
+        stop = self.n_frames if t1 is None else int(np.searchsorted(self.t, t1, side="right"))
+        return slice(start, stop, step)
+
+    def read(self, var="V", t0=None, t1=None, rows=slice(None), cols=slice(None), step=1):
+        """Copy of var over the time window and rectangular region, shape (frames, rows, cols)."""
+        return np.array(self.array(var)[self.time_slice(t0, t1, step), rows, cols])
+
+    def read_region(self, mask, var="V", t0=None, t1=None, step=1):
+        """Cells where mask is true, shape (frames, n_cells); reads only the mask's bounding box."""
+        mask = np.asarray(mask, dtype=bool)
+        rows, cols = np.nonzero(mask)
+        if rows.size == 0:
+            return np.empty((len(range(*self.time_slice(t0, t1, step).indices(self.n_frames))), 0))
+        box = (slice(rows.min(), rows.max() + 1), slice(cols.min(), cols.max() + 1))
+        block = self.read(var, t0, t1, box[0], box[1], step)
+        return block[:, mask[box]]
+
+    def frame(self, time, var="V"):
+        """The stored frame nearest to time."""
+        return np.array(self.array(var)[int(np.argmin(np.abs(self.t - time)))])
+
+
+# =========================
+# Self-check
+# =========================
+
+def _expect(condition, message):
+    if not condition:
+        raise AssertionError(f"trajectory store round trip: {message}")
+
+
+def validate_round_trip(shape=(6, 5), n_points=101, chunk_steps=16):
+    """Write simulate_coupled_tissue runs through TrajectoryWriter and read them back.
+
+    n_points is not a multiple of chunk_steps, so the last chunk is partial.
+    Checks that the last stored frame equals the returned grid (Euler and BDF)
+    and that intermediate Euler frames equal shorter runs. It also checks
+    time/region reads, and that a writer left open exposes only its flushed
+    frames. Returns the number of frames compared.
+    """
+    import tempfile
+
+    from gap_junction_tissue import simulate_coupled_tissue
+    from tissue_sim import half_mask
+
+    t = np.linspace(0, 20, n_points)
+    mask = half_mask(*shape)
+    k3 = np.where(mask, 0.001, 0.01)
+    compared = 0
+    with tempfile.TemporaryDirectory() as root:
+        for method in ("euler", "bdf"):
+            path = os.path.join(root, method)
+            with TrajectoryWriter(path, shape, t, variables=("X", "V"), mask=mask,
+                                  params=dict(k1=1.0, k3=k3), chunk_steps=chunk_steps) as store:
+                X, V = simulate_coupled_tissue(1, 0.1, k3, shape, t, store=store, method=method)
+            reader = TrajectoryReader(path)
+            _expect(reader.n_frames == n_points, f"{method}: {reader.n_frames} frames stored")
+            _expect(np.array_equal(reader.read("V")[-1], V)
+                    and np.array_equal(reader.read("X")[-1], X),
+                    f"{method}: last stored frame differs from the returned grid")
+            _expect(np.array_equal(reader.mask, mask) and np.array_equal(reader.params["k3"], k3),
+                    f"{method}: mask or per-cell params not round-tripped")
+            compared += 2
+            if method != "euler":
+                continue
+            for k in (chunk_steps - 1, chunk_steps, n_points // 2):  # frame k = state at t[k]
+                _, Vk = simulate_coupled_tissue(1, 0.1, k3, shape, t[:k + 1])
+                _expect(np.array_equal(reader.frame(t[k]), Vk), f"frame {k} differs")
+                compared += 1
+            window = reader.time_slice(t[10], t[30])
+            block = reader.read("V", t[10], t[30], rows=slice(1, 4), cols=slice(2, 5))
+            _expect(np.array_equal(block, reader.array("V")[window, 1:4, 2:5]),
+                    "windowed read differs")
+            _expect(np.array_equal(reader.read_region(mask, t0=t[10], t1=t[30]),
+                                   reader.array("V")[window][:, mask]), "region read differs")
+
+        # a writer that is never closed: only whole flushed chunks are visible
+        path = os.path.join(root, "open")
+        store = TrajectoryWriter(path, shape, t, chunk_steps=chunk_steps)
+        for _ in range(chunk_steps + 3):
+            store.append(V=np.ones(shape))
+        _expect(TrajectoryReader(path).n_frames == chunk_steps, "unflushed frames visible")
+        store.close()
+        _expect(TrajectoryReader(path).n_frames == chunk_steps + 3, "close() lost frames")
+    return compared
+
+
+if __name__ == "__main__":
+    n = validate_round_trip()
+    print(f"✅ Trajectory store round-trips {n} frames (partial last chunk included)")